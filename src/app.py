@@ -24,6 +24,14 @@ gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, Gdk, Gio, GLib
 
 from .window import NetworkScannerWindow
+from . import storage
+
+RETENTION_KEYS = (
+    "history-keep-all-days",
+    "history-keep-hourly-days",
+    "history-keep-daily-days",
+    "history-max-size",
+)
 
 COLOR_SCHEMES = {
     "light": Adw.ColorScheme.FORCE_LIGHT,
@@ -37,10 +45,16 @@ class NetworkScannerApp(Adw.Application):
     def __init__(self):
         super().__init__(application_id='io.github.zingytomato.netpeek')
         self.settings = Gio.Settings.new('io.github.zingytomato.netpeek')
+        # History writes happen off the main loop; results come back through it.
+        self.storage_writer = storage.StorageWriter(dispatch=GLib.idle_add)
 
         self._create_color_scheme_action()
         self._apply_color_scheme()
 
+        for key in RETENTION_KEYS:
+            self.settings.connect(f"changed::{key}", lambda *_: self._apply_retention_policy())
+        self._apply_retention_policy()
+
     def do_startup(self):
         Adw.Application.do_startup(self)
         # Make the bundled app icons resolvable without an installed icon
@@ -49,6 +63,10 @@ class NetworkScannerApp(Adw.Application):
             '/io/github/zingytomato/netpeek/icons')
         self._load_css()
 
+    def do_shutdown(self):
+        self.storage_writer.close()
+        Adw.Application.do_shutdown(self)
+
     def _load_css(self):
         provider = Gtk.CssProvider()
         provider.load_from_resource('/io/github/zingytomato/netpeek/gtk/style.css')
@@ -75,7 +93,16 @@ class NetworkScannerApp(Adw.Application):
         Adw.StyleManager.get_default().set_color_scheme(
             COLOR_SCHEMES.get(scheme, Adw.ColorScheme.DEFAULT))
 
+    def _apply_retention_policy(self):
+        self.storage_writer.set_retention_policy(storage.RetentionPolicy(
+            keep_all_days=self.settings.get_int("history-keep-all-days"),
+            hourly_days=self.settings.get_int("history-keep-hourly-days"),
+            daily_days=self.settings.get_int("history-keep-daily-days"),
+            max_bytes=self.settings.get_int("history-max-size") * 1024 * 1024,
+        ))
+
     def do_activate(self):
         """Called when the application is activated"""
-        self.window = NetworkScannerWindow(application=self, settings=self.settings)
+        self.window = NetworkScannerWindow(application=self, settings=self.settings,
+                                           storage_writer=self.storage_writer)
         self.window.present()
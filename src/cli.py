@@ -0,0 +1,312 @@
+# cli.py
+#
+# Copyright 2026 ZingyTomato
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import argparse
+import asyncio
+import csv
+import json
+import signal
+import sys
+import threading
+import time
+
+# Nothing from gi here: this has to start quickly and run without a display.
+from .scanner import NetworkScanner, PHASE_DISCOVERY, asyncio_dispatcher
+from . import scheduler, server, storage
+
+CSV_FIELDS = ("ip", "hostname", "mac", "ports", "services", "os_display")
+
+
+class _Writer:
+    """Write devices to stdout as they arrive, once each."""
+
+    def __init__(self, output_format):
+        self.output_format = output_format
+        self.seen = set()
+        if output_format == "csv":
+            self.csv = csv.writer(sys.stdout)
+            self.csv.writerow(CSV_FIELDS)
+
+    def write(self, devices):
+        for device in devices:
+            if device["ip"] in self.seen:
+                continue
+            self.seen.add(device["ip"])
+            if self.output_format == "csv":
+                self.csv.writerow([
+                    " ".join(map(str, value)) if isinstance(value, list) else value
+                    for value in (device.get(field, "") for field in CSV_FIELDS)
+                ])
+            else:
+                sys.stdout.write(json.dumps(device) + "\n")
+        sys.stdout.flush()
+
+
+def _parse_args(argv, version):
+    parser = argparse.ArgumentParser(
+        prog="netpeek-cli",
+        description=_("Scan a network without the graphical interface."),
+        epilog=_("Run 'netpeek-cli serve --help' for the HTTP/JSON daemon and "
+                 "'netpeek-cli schedule --help' for recurring scans."))
+    parser.add_argument("--version", action="version", version=f"%(prog)s {version}")
+    parser.add_argument(
+        "ranges", nargs="+", metavar="RANGE",
+        help=_("CIDR, range or address to scan; '!' excludes, e.g. 10.0.0.0/24 !10.0.0.1"))
+    parser.add_argument(
+        "-t", "--threads", type=int, default=100,
+        help=_("worker threads for deep scans (1–500, default 100)"))
+    parser.add_argument(
+        "-d", "--deep", action="store_true",
+        help=_("deep scan with nmap for OS and service details"))
+    parser.add_argument(
+        "-f", "--format", choices=("jsonl", "csv"), default="jsonl",
+        help=_("output format (default jsonl)"))
+    parser.add_argument(
+        "-r", "--record", action="store_true",
+        help=_("save the scan to the history shared with the app"))
+    parser.add_argument(
+        "-q", "--quiet", action="store_true",
+        help=_("don't report progress on stderr"))
+    args = parser.parse_args(argv)
+    if not 1 <= args.threads <= 500:
+        parser.error(_("Thread count must be between 1 and 500"))
+    return args
+
+
+async def _scan(args, ip_range):
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    scanner = NetworkScanner(dispatch=asyncio_dispatcher(loop))
+    scanner.set_max_workers(args.threads)
+    writer = _Writer(args.format)
+    show_progress = not args.quiet and sys.stderr.isatty()
+
+    def end_progress():
+        if show_progress:
+            sys.stderr.write("\n")
+
+    def finish(devices, code=0):
+        if done.done():
+            return
+        writer.write(devices)
+        if args.record and devices:
+            storage.record_scan(ip_range, devices, deep_scan=args.deep)
+        end_progress()
+        done.set_result(code)
+
+    def on_error(message):
+        if done.done():
+            return
+        end_progress()
+        print(message, file=sys.stderr)
+        done.set_result(1)
+
+    def on_progress(scanned, total, phase=None, rate=0.0, eta=None):
+        if show_progress:
+            label = _("Discovering hosts") if phase == PHASE_DISCOVERY else _("Scanning hosts")
+            sys.stderr.write(f"\r{label}: {scanned}/{total} ({rate:.0f}/s)\033[K")
+            sys.stderr.flush()
+
+    def on_interrupt():
+        # Keep whatever was found so far, like stopping a scan in the app.
+        scanner.stop_scan()
+        finish(scanner.get_partial_results(), 130)
+
+    loop.add_signal_handler(signal.SIGINT, on_interrupt)
+    scanner.scan_network(ip_range, finish, on_error, on_progress,
+                         deep_scan=args.deep, results_callback=writer.write)
+    return await done
+
+
+def _parse_serve_args(argv, version):
+    parser = argparse.ArgumentParser(
+        prog="netpeek-cli serve",
+        description=_("Run the scanner as a daemon with a local HTTP/JSON API."))
+    parser.add_argument("--version", action="version", version=f"%(prog)s {version}")
+    parser.add_argument(
+        "--host", default=server.DEFAULT_HOST,
+        help=_("address to listen on (default {host})").format(host=server.DEFAULT_HOST))
+    parser.add_argument(
+        "--port", type=int, default=server.DEFAULT_PORT,
+        help=_("port to listen on (default {port})").format(port=server.DEFAULT_PORT))
+    parser.add_argument(
+        "-w", "--watch", action="append", default=[], metavar="RANGE",
+        help=_("rescan this range continuously; may be repeated"))
+    parser.add_argument(
+        "-i", "--interval", type=int, default=300,
+        help=_("seconds between rescans of watched ranges (default 300)"))
+    parser.add_argument(
+        "--no-record", action="store_true",
+        help=_("don't save finished scans to the history"))
+    args = parser.parse_args(argv)
+    for ip_range in args.watch:
+        is_valid, message = NetworkScanner().validate_ip_range(ip_range)
+        if not is_valid:
+            parser.error(message)
+    if args.interval < 1:
+        parser.error(_("The interval must be at least one second"))
+    return args
+
+
+def _watch(service, ranges, interval, stopping):
+    while True:
+        for ip_range in ranges:
+            # Joins the running scan if the last one isn't done yet.
+            service.start(ip_range)
+        if stopping.wait(interval):
+            return
+
+
+def serve(version="0.0.0-dev", argv=()):
+    args = _parse_serve_args(argv, version)
+    service = server.ScanService(record=not args.no_record)
+    try:
+        httpd = server.make_server(args.host, args.port, service, scheduler.Scheduler(service))
+    except OSError as e:
+        print(_("Could not listen on {host}:{port}: {e}").format(host=args.host, port=args.port, e=e),
+              file=sys.stderr)
+        return 1
+
+    if args.host not in ("localhost", server.DEFAULT_HOST, "::1"):
+        print(_("Warning: the API has no authentication; anyone who can reach {host} can use it").format(
+            host=args.host), file=sys.stderr)
+
+    stopping = threading.Event()
+    if args.watch:
+        threading.Thread(target=_watch, args=(service, args.watch, args.interval, stopping),
+                         daemon=True).start()
+    httpd.scheduler.start()
+
+    def shut_down(_signum, _frame):
+        stopping.set()
+        threading.Thread(target=httpd.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, shut_down)
+    signal.signal(signal.SIGTERM, shut_down)
+    print(_("Listening on http://{host}:{port}/").format(host=args.host, port=httpd.server_port),
+          file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.scheduler.stop()
+        service.close()
+        httpd.server_close()
+    return 0
+
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _duration(text):
+    """Parse seconds, optionally with an s/m/h/d suffix, e.g. 15m."""
+    unit = _DURATION_UNITS.get(text[-1:].lower())
+    try:
+        return int(text[:-1] if unit else text) * (unit or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(_("Invalid duration: {text}").format(text=text))
+
+
+def _port_list(text):
+    try:
+        return sorted({int(port) for port in text.split(",") if port.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(_("Invalid port list: {text}").format(text=text))
+
+
+def _parse_schedule_args(argv, version):
+    parser = argparse.ArgumentParser(
+        prog="netpeek-cli schedule",
+        description=_("Manage recurring scans, run by 'netpeek-cli serve'."))
+    parser.add_argument("--version", action="version", version=f"%(prog)s {version}")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help=_("add or replace a schedule"))
+    add.add_argument("name", help=_("name of the schedule"))
+    add.add_argument("ranges", nargs="+", metavar="RANGE", help=_("ranges to scan, as for a scan"))
+    add.add_argument(
+        "-e", "--every", type=_duration, required=True, metavar="DURATION",
+        help=_("time between scans, in seconds or with an s/m/h/d suffix"))
+    add.add_argument(
+        "-j", "--jitter", type=_duration, default=0, metavar="DURATION",
+        help=_("random extra delay of up to this much before each scan"))
+    add.add_argument(
+        "-p", "--ports", type=_port_list, metavar="PORTS",
+        help=_("comma-separated ports to probe instead of the default set"))
+    add.add_argument(
+        "-d", "--deep", action="store_true",
+        help=_("deep scan with nmap for OS and service details"))
+    add.add_argument(
+        "--queue", action="store_const", const=scheduler.QUEUE, default=scheduler.SKIP,
+        dest="overlap", help=_("run late instead of skipping when the previous scan is still going"))
+    add.add_argument(
+        "--disabled", action="store_true",
+        help=_("save the schedule without running it"))
+
+    commands.add_parser("list", help=_("show the saved schedules"))
+
+    remove = commands.add_parser("remove", help=_("delete a schedule"))
+    remove.add_argument("name", help=_("name of the schedule"))
+
+    args = parser.parse_args(argv)
+    if args.command == "add":
+        args.ip_range = ", ".join(args.ranges)
+        is_valid, message = scheduler.validate_schedule(args.ip_range, args.every, args.ports,
+                                                        args.jitter, args.overlap)
+        if not is_valid:
+            parser.error(message)
+    return args
+
+
+def schedule(version="0.0.0-dev", argv=()):
+    args = _parse_schedule_args(argv, version)
+    if args.command == "add":
+        storage.save_schedule(args.name, args.ip_range, args.every, ports=args.ports,
+                              deep_scan=args.deep, jitter=args.jitter, overlap=args.overlap,
+                              enabled=not args.disabled)
+    elif args.command == "remove":
+        if not storage.delete_schedule(args.name):
+            print(_("No schedule named {name}").format(name=args.name), file=sys.stderr)
+            return 1
+    else:
+        for entry in storage.load_schedules():
+            last_run = (time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_run"]))
+                        if entry["last_run"] else "-")
+            ports = ",".join(map(str, entry["ports"])) if entry["ports"] else "-"
+            sys.stdout.write("\t".join((
+                entry["name"], entry["ip_range"], f"{entry['interval']}s", f"+{entry['jitter']}s",
+                ports, "deep" if entry["deep_scan"] else "fast", entry["overlap"],
+                "enabled" if entry["enabled"] else "disabled", last_run)) + "\n")
+    return 0
+
+
+def main(version="0.0.0-dev", argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["serve"]:
+        return serve(version, argv[1:])
+    if argv[:1] == ["schedule"]:
+        return schedule(version, argv[1:])
+
+    args = _parse_args(argv, version)
+    ip_range = ", ".join(args.ranges)
+
+    is_valid, message = NetworkScanner().validate_ip_range(ip_range)
+    if not is_valid:
+        print(message, file=sys.stderr)
+        return 2
+    return asyncio.run(_scan(args, ip_range))
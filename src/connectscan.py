@@ -0,0 +1,149 @@
+# connectscan.py
+#
+# Copyright 2026 ZingyTomato
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import socket
+import struct
+
+try:
+    import resource
+except ImportError:  # Not available outside Unix
+    resource = None
+
+# Probe outcomes. A refused connection still proves the host is alive.
+OPEN = "open"
+CLOSED = "closed"
+FILTERED = "filtered"
+
+# File descriptors kept free for everything else the process does.
+_FD_RESERVE = 64
+
+# Close with an immediate RST instead of lingering in TIME_WAIT, so tens of
+# thousands of probes don't exhaust the local port range.
+_LINGER_RST = struct.pack("ii", 1, 0)
+
+
+def fd_budget():
+    """Raise the open file limit as far as allowed and return how many
+    sockets can safely be open at once."""
+    if resource is None:
+        return 1024 - _FD_RESERVE
+    try:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if hard == resource.RLIM_INFINITY or hard > soft:
+            target = hard if hard != resource.RLIM_INFINITY else 65536
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+            soft = target
+    except (ValueError, OSError):
+        soft = 1024
+    return max(1, soft - _FD_RESERVE)
+
+
+async def probe_port(ip, port, timeout):
+    """Attempt a single non-blocking TCP connect and classify the outcome."""
+    loop = asyncio.get_running_loop()
+    sock = None
+    try:
+        # Creating the socket can fail too (EMFILE, ENFILE); that only
+        # costs this probe, not the whole scan.
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RST)
+        await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+        return OPEN
+    except ConnectionRefusedError:
+        return CLOSED
+    except (asyncio.TimeoutError, OSError):
+        return FILTERED
+    finally:
+        if sock is not None:
+            sock.close()
+
+
+class ConnectScanner:
+    """Sweep hosts x ports with plain TCP connect() calls on one event loop.
+
+    A single semaphore caps the number of connects in flight across all
+    hosts, and only a bounded window of hosts is in progress at any time.
+    """
+
+    def __init__(self, ports, concurrency=1024, timeout=1.0):
+        self.ports = list(ports)
+        self.concurrency = max(1, min(concurrency, fd_budget()))
+        self.timeout = timeout
+
+    async def _scan_host(self, ip, semaphore):
+        async def probe(port):
+            async with semaphore:
+                return port, await probe_port(ip, port, self.timeout)
+
+        results = await asyncio.gather(*(probe(port) for port in self.ports))
+        open_ports = sorted(port for port, state in results if state == OPEN)
+        alive = any(state != FILTERED for _port, state in results)
+        return ip, alive, open_ports
+
+    async def sweep(self, hosts, should_continue=lambda: True):
+        """Yield (ip, alive, open_ports) for each host as soon as it finishes.
+
+        hosts may also be an async iterable, such as the live hosts of a
+        discovery sweep that is still running: probing starts with the first
+        host it yields instead of waiting for the last.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Enough hosts in flight to keep the connect budget saturated.
+        window = 2 * max(1, self.concurrency // max(1, len(self.ports)))
+        pending = set()
+        streaming = hasattr(hosts, "__aiter__")
+        hosts = aiter(hosts) if streaming else iter(hosts)
+        fetch = None
+        exhausted = False
+
+        try:
+            while True:
+                while not exhausted and len(pending) < window and should_continue():
+                    if not streaming:
+                        host = next(hosts, None)
+                    else:
+                        # The next host is awaited alongside the probes
+                        # already running, never in front of them.
+                        if fetch is None:
+                            fetch = asyncio.ensure_future(anext(hosts, None))
+                        if not fetch.done():
+                            break
+                        host, fetch = fetch.result(), None
+                    if host is None:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(self._scan_host(str(host), semaphore)))
+                waiting = pending | ({fetch} if fetch is not None and len(pending) < window else set())
+                if not waiting:
+                    return
+                done, _waiting = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                for task in done & pending:
+                    pending.discard(task)
+                    yield task.result()
+                if not should_continue():
+                    return
+        finally:
+            if fetch is not None:
+                pending.add(fetch)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,100 @@
+# diff.py
+#
+# Copyright 2026 ZingyTomato
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from collections import Counter
+
+from .storage import device_key
+
+# Kinds of change, each mapped to its detail in ScanDiff.changes.
+NEW = "new"                            # None
+IP_CHANGED = "ip-changed"              # the previous IP
+HOSTNAME_CHANGED = "hostname-changed"  # the previous hostname
+PORTS_OPENED = "ports-opened"          # sorted list of ports
+PORTS_CLOSED = "ports-closed"          # sorted list of ports
+GONE = "gone"
+
+
+class ScanDiff:
+    """What changed between an older and a newer scan.
+
+    `changes` maps the key of every device in the newer scan that is new or
+    changed to a {kind: detail} dict, and `gone` lists the devices of the
+    older scan that the newer one no longer has.
+    """
+
+    def __init__(self, changes, gone):
+        self.changes = changes
+        self.gone = gone
+
+    def __bool__(self):
+        return bool(self.changes or self.gone)
+
+    def counts(self):
+        """Return how many devices are new, gone and otherwise changed."""
+        counts = Counter(NEW if NEW in found else "changed" for found in self.changes.values())
+        counts[GONE] = len(self.gone)
+        return counts
+
+
+def _hostname(device):
+    hostname = device.get("hostname") or ""
+    return "" if hostname == device.get("ip") else hostname
+
+
+def diff_scans(old_devices, new_devices):
+    """Compare two scans' device lists by device key (MAC, else IP).
+
+    Both scans are indexed by key once, so this is linear in the number of
+    devices. A device whose MAC is only known in one of the scans is still
+    matched by its IP.
+    """
+    old_by_key = {device_key(d.get("mac", ""), d.get("ip", "")): d for d in old_devices}
+    old_by_ip = {d.get("ip", ""): d for d in old_devices}
+    matched = set()
+    changes = {}
+
+    for device in new_devices:
+        key = device_key(device.get("mac", ""), device.get("ip", ""))
+        old = old_by_key.get(key)
+        if old is None:
+            candidate = old_by_ip.get(device.get("ip", ""))
+            if candidate is not None and not (candidate.get("mac") and device.get("mac")):
+                old = candidate
+        if old is None:
+            changes[key] = {NEW: None}
+            continue
+        matched.add(id(old))
+
+        found = {}
+        if old.get("ip") != device.get("ip"):
+            found[IP_CHANGED] = old.get("ip", "")
+        old_hostname, new_hostname = _hostname(old), _hostname(device)
+        if old_hostname and new_hostname and old_hostname != new_hostname:
+            found[HOSTNAME_CHANGED] = old_hostname
+        old_ports = set(old.get("ports") or ())
+        new_ports = set(device.get("ports") or ())
+        if new_ports - old_ports:
+            found[PORTS_OPENED] = sorted(new_ports - old_ports)
+        if old_ports - new_ports:
+            found[PORTS_CLOSED] = sorted(old_ports - new_ports)
+        if found:
+            changes[key] = found
+
+    gone = [device for device in old_devices if id(device) not in matched]
+    return ScanDiff(changes, gone)
@@ -0,0 +1,162 @@
+# discovery.py
+#
+# Copyright 2026 ZingyTomato
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import asyncio
+import socket
+import struct
+import time
+
+from . import netinfo
+from .connectscan import FILTERED, fd_budget, probe_port
+
+# Ports used for the TCP "ping". Either an accept or a refusal proves the
+# host is there; nmap's unprivileged discovery uses 80 and 443.
+PING_PORTS = (80, 443, 22, 445)
+
+_ICMP_ECHO_REQUEST = 8
+_ICMP_ECHO_REPLY = 0
+
+
+def _icmp_checksum(data):
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _icmp_echo_packet(seq):
+    payload = b"netpeek"
+    header = struct.pack("!BBHHH", _ICMP_ECHO_REQUEST, 0, 0, 0, seq)
+    checksum = _icmp_checksum(header + payload)
+    return struct.pack("!BBHHH", _ICMP_ECHO_REQUEST, 0, checksum, 0, seq) + payload
+
+
+def icmp_permitted():
+    """Whether unprivileged ICMP echo sockets are allowed (net.ipv4.ping_group_range)."""
+    try:
+        socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP).close()
+        return True
+    except OSError:
+        return False
+
+
+async def icmp_ping(ip, timeout, seq=1):
+    """Send one echo request over an unprivileged ICMP socket."""
+    loop = asyncio.get_running_loop()
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    except OSError:
+        return False
+    sock.setblocking(False)
+    try:
+        # The kernel rewrites the echo id and only delivers replies that
+        # match it, so a connected socket needs no filtering of its own.
+        sock.connect((ip, 0))
+        sock.send(_icmp_echo_packet(seq))
+        data = await asyncio.wait_for(loop.sock_recv(sock, 1024), timeout)
+        return bool(data) and data[0] == _ICMP_ECHO_REPLY
+    except (asyncio.TimeoutError, OSError):
+        return False
+    finally:
+        sock.close()
+
+
+class HostDiscovery:
+    """Find which addresses are alive before spending port probes on them.
+
+    A host counts as alive if it answers a TCP connect to any of the ping
+    ports (accept or refusal), or an ICMP echo when unprivileged ICMP is
+    available. Hosts on the local link that drop every probe still answer
+    ARP while being probed, so an ARP entry that resolved during the probe
+    counts too. Entries already in the cache prove nothing: the kernel
+    keeps stale ones, MAC and all, long after a device has left.
+    """
+
+    def __init__(self, ports=PING_PORTS, concurrency=1024, timeout=1.0, use_icmp=True):
+        self.ports = tuple(ports)
+        self.concurrency = max(1, min(concurrency, fd_budget()))
+        self.timeout = timeout
+        self.use_icmp = use_icmp and icmp_permitted()
+        self._arp = {}
+        self._arp_read_at = 0.0
+
+    def _arp_has(self, ip):
+        # Refreshing more often than the probe timeout guarantees that an
+        # entry resolved at the start of a timed-out probe is visible here.
+        now = time.monotonic()
+        if now - self._arp_read_at > self.timeout / 2:
+            self._arp = netinfo.read_arp_table()
+            self._arp_read_at = now
+        return ip in self._arp
+
+    async def _probe_host(self, ip, semaphore, known):
+        async def tcp_ping(port):
+            async with semaphore:
+                return await probe_port(ip, port, self.timeout) != FILTERED
+
+        async def echo():
+            async with semaphore:
+                return await icmp_ping(ip, self.timeout)
+
+        probes = [asyncio.ensure_future(tcp_ping(port)) for port in self.ports]
+        if self.use_icmp:
+            probes.append(asyncio.ensure_future(echo()))
+        try:
+            for next_done in asyncio.as_completed(probes):
+                if await next_done:
+                    return ip, True, True
+            return ip, ip not in known and self._arp_has(ip), False
+        finally:
+            for probe in probes:
+                probe.cancel()
+
+    async def sweep(self, hosts, should_continue=lambda: True):
+        """Yield (ip, alive, answered) for each host as soon as it is decided.
+
+        answered is False for hosts that only ARP vouched for, so later
+        probes should decide for themselves whether those are up.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Entries resolved before the sweep, which can't vouch for anyone.
+        known = netinfo.read_arp_table()
+        window = 2 * max(1, self.concurrency // (len(self.ports) + 1))
+        pending = set()
+        hosts = iter(hosts)
+
+        try:
+            while True:
+                while len(pending) < window and should_continue():
+                    host = next(hosts, None)
+                    if host is None:
+                        break
+                    pending.add(asyncio.ensure_future(self._probe_host(str(host), semaphore, known)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+                if not should_continue():
+                    return
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,160 @@
+# iprange.py
+#
+# Copyright 2026 ZingyTomato
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import bisect
+import ipaddress
+import socket
+import struct
+
+_pack_ip = struct.Struct('!I').pack
+_unpack_ip = struct.Struct('!I').unpack
+
+
+def ip_to_int(ip):
+    return _unpack_ip(socket.inet_aton(ip))[0]
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(_pack_ip(value))
+
+
+def _parse_address(text):
+    return int(ipaddress.IPv4Address(text.strip()))
+
+
+def _parse_item(item, whole_block):
+    """Parse one range term into an inclusive (first, last) interval.
+
+    Supported forms are CIDR (10.0.0.0/24), a full range
+    (10.0.0.5-10.0.1.20), a last-octet range (192.168.1.10-20 or
+    192.168.1-20) and a single address. For CIDR terms, scanning skips the
+    network and broadcast addresses like IPv4Network.hosts() does, while an
+    exclusion (whole_block) removes the entire block.
+    """
+    if '/' in item:
+        net = ipaddress.IPv4Network(item, strict=False)
+        first = int(net.network_address)
+        last = int(net.broadcast_address)
+        if not whole_block and net.prefixlen < 31:
+            first += 1
+            last -= 1
+    elif '-' in item:
+        start, end = (part.strip() for part in item.rsplit('-', 1))
+        if '.' in end:
+            first = _parse_address(start)
+            last = _parse_address(end)
+        else:
+            base_parts = start.split('.')
+            if len(base_parts) == 4:
+                base_network = '.'.join(base_parts[:3])
+                start_octet = base_parts[3]
+            elif len(base_parts) == 3:
+                base_network = start
+                start_octet = '1'
+            else:
+                raise ValueError(_("Invalid range format!"))
+            first = _parse_address(f"{base_network}.{start_octet}")
+            last = _parse_address(f"{base_network}.{end}")
+    else:
+        first = last = _parse_address(item)
+
+    if first > last:
+        raise ValueError(_("Range {item} ends before it starts").format(item=item))
+    return first, last
+
+
+class IPRangeSet:
+    """A set of IPv4 addresses stored as sorted, merged intervals.
+
+    Membership is a binary search and the size is kept up to date, so
+    neither ever expands the range.
+    """
+
+    def __init__(self, intervals=()):
+        self._starts = []
+        self._ends = []
+        for first, last in sorted(intervals):
+            if self._ends and first <= self._ends[-1] + 1:
+                self._ends[-1] = max(self._ends[-1], last)
+            else:
+                self._starts.append(first)
+                self._ends.append(last)
+        self._size = sum(last - first + 1 for first, last in self.intervals)
+
+    @classmethod
+    def parse(cls, text):
+        """Parse a comma-separated list of ranges, with '!' marking exclusions.
+
+        For example: "10.0.0.0/16, 192.168.1.10-20, !10.0.5.0/24".
+        Raises ValueError if the text is malformed or excludes everything.
+        """
+        include, exclude = [], []
+        for raw in text.split(','):
+            item = raw.strip()
+            if not item:
+                continue
+            if item.startswith('!'):
+                exclude.append(_parse_item(item[1:].strip(), whole_block=True))
+            else:
+                include.append(_parse_item(item, whole_block=False))
+
+        if not include:
+            raise ValueError(_("No addresses to scan"))
+        return cls(include).difference(cls(exclude))
+
+    @property
+    def intervals(self):
+        return list(zip(self._starts, self._ends))
+
+    def difference(self, other):
+        """Return the addresses in this set that are not in other."""
+        result = []
+        removals = other.intervals
+        index = 0
+        for first, last in self.intervals:
+            while index < len(removals) and removals[index][1] < first:
+                index += 1
+            cursor = first
+            probe = index
+            while probe < len(removals) and removals[probe][0] <= last:
+                gap_first, gap_last = removals[probe]
+                if gap_first > cursor:
+                    result.append((cursor, gap_first - 1))
+                cursor = max(cursor, gap_last + 1)
+                probe += 1
+            if cursor <= last:
+                result.append((cursor, last))
+        return IPRangeSet(result)
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __contains__(self, ip):
+        value = ip if isinstance(ip, int) else ip_to_int(str(ip))
+        index = bisect.bisect_right(self._starts, value) - 1
+        return index >= 0 and value <= self._ends[index]
+
+    def __iter__(self):
+        """Lazily yield dotted-quad addresses in ascending order."""
+        for first, last in self.intervals:
+            for value in range(first, last + 1):
+                yield int_to_ip(value)
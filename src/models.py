@@ -17,11 +17,46 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
-import ipaddress
+import bisect
+import socket
+import sys
+from array import array
+from collections import OrderedDict
 
-from gi.repository import GObject
+from gi.repository import GObject, Gio, GLib, Gtk
 
 from . import storage
+from .search import SearchKeys
+
+# Translated once at import rather than for every Device.
+SERVICE_LABELS = {
+    "smb": _("SMB shares"),
+    "cockpit": _("Cockpit"),
+    "mysql": _("MySQL"),
+    "postgresql": _("PostgreSQL"),
+    "redis": _("Redis"),
+    "homeassistant": _("Home Assistant"),
+    "plex": _("Plex"),
+    "cups": _("CUPS"),
+    "mongodb": _("MongoDB"),
+    "proxmox": _("Proxmox"),
+    "synology": _("Synology DSM"),
+}
+
+# Service lists seen so far, as (interned names, labels, display string).
+# Scanners only report a small fixed set of services, so a whole history
+# shares a handful of these between all its devices.
+_service_sets = {}
+
+
+def _services_for(names):
+    key = tuple(names)
+    entry = _service_sets.get(key)
+    if entry is None:
+        services = tuple(sys.intern(name) for name in key)
+        labels = tuple(SERVICE_LABELS.get(name, name) for name in services)
+        entry = _service_sets[key] = (services, labels, ", ".join(labels))
+    return entry
 
 
 class Device(GObject.Object):
@@ -41,6 +76,8 @@ class Device(GObject.Object):
     ip_sort_key = GObject.Property(type=GObject.TYPE_UINT64, default=0)
     os_display = GObject.Property(type=str, default="")
     deep_scanned = GObject.Property(type=bool, default=False)
+    change_display = GObject.Property(type=str, default="")
+    gone = GObject.Property(type=bool, default=False)
 
     def __init__(self, data):
         super().__init__()
@@ -48,35 +85,24 @@ class Device(GObject.Object):
         self.hostname = data.get("hostname") or self.ip
         self.custom_name = data.get("custom_name", "") or ""
         self.mac = data.get("mac", "") or ""
-        self.ports = data.get("ports", [])
+        # Two bytes per port instead of a list of int objects.
+        self.ports = array("H", data.get("ports") or ())
         self.ports_display = data.get("ports_display", "")
         self.smb = bool(data.get("smb", False))
-        self.services = data.get("services") or (["smb"] if self.smb else [])
-        service_labels = {
-            "smb": _("SMB shares"),
-            "cockpit": _("Cockpit"),
-            "mysql": _("MySQL"),
-            "postgresql": _("PostgreSQL"),
-            "redis": _("Redis"),
-            "homeassistant": _("Home Assistant"),
-            "plex": _("Plex"),
-            "cups": _("CUPS"),
-            "mongodb": _("MongoDB"),
-            "proxmox": _("Proxmox"),
-            "synology": _("Synology DSM"),
-        }
-        self.services_display = ", ".join(service_labels.get(s, s) for s in self.services)
+        self.services, self._service_labels, self.services_display = _services_for(
+            data.get("services") or (("smb",) if self.smb else ()))
         self.known = bool(data.get("known", False))
         self.known_int = 1 if self.known else 0
         self.ip_sort_key = self._ip_to_int(self.ip)
         self.os_display = data.get("os_display", "") or ""
         self.deep_scanned = data.get("deep_scanned", False)
+        self._search_keys = None
 
     @staticmethod
     def _ip_to_int(ip):
         try:
-            return int(ipaddress.IPv4Address(ip))
-        except ValueError:
+            return int.from_bytes(socket.inet_aton(ip), "big")
+        except OSError:
             return 0
 
     @property
@@ -87,6 +113,14 @@ class Device(GObject.Object):
             return self.hostname
         return self.ip
 
+    @property
+    def search_keys(self):
+        """What search queries match against, built on first use."""
+        if self._search_keys is None:
+            self._search_keys = SearchKeys(self.ip, self.hostname, self.mac, self.ports,
+                                           self.services, self._service_labels, self.os_display)
+        return self._search_keys
+
     @property
     def registry_key(self):
         return storage.device_key(self.mac, self.ip)
@@ -97,11 +131,104 @@ class Device(GObject.Object):
             "hostname": self.hostname,
             "custom_name": self.custom_name,
             "mac": self.mac,
-            "ports": self.ports,
+            "ports": list(self.ports),
             "ports_display": self.ports_display,
             "smb": self.smb,
-            "services": self.services,
+            "services": list(self.services),
             "known": self.known,
             "os_display": self.os_display,
             "deep_scanned": self.deep_scanned,
         }
+
+
+class ScanSummary(GObject.Object):
+    """One row of the scan history, without the scanned devices."""
+
+    __gtype_name__ = "NetpeekScanSummary"
+
+    scan_id = GObject.Property(type=GObject.TYPE_INT64, default=0)
+    timestamp = GObject.Property(type=str, default="")
+    ip_range = GObject.Property(type=str, default="")
+    device_count = GObject.Property(type=int, default=0)
+    deep_scan = GObject.Property(type=bool, default=False)
+
+    def __init__(self, data):
+        super().__init__()
+        self.scan_id = data["id"]
+        self.timestamp = data.get("timestamp", "")
+        self.ip_range = data.get("ip_range", "")
+        self.device_count = data.get("device_count", 0)
+        self.deep_scan = bool(data.get("deep_scan", False))
+
+
+class ScanHistoryModel(GObject.Object, Gio.ListModel, Gtk.SectionModel):
+    """Saved scans, newest first, fetched from storage a page at a time.
+
+    Only the per-day counts are read up front; they give the length of the
+    list and its date sections. Rows are loaded when the view asks for
+    them, and only a bounded number of pages is kept around.
+    """
+
+    __gtype_name__ = "NetpeekScanHistoryModel"
+
+    PAGE_SIZE = 100
+    MAX_PAGES = 16
+
+    def __init__(self):
+        super().__init__()
+        self._pages = OrderedDict()
+        self._section_starts = []
+        self._n_items = 0
+        self._load_sections()
+
+    def _load_sections(self):
+        self._section_starts = []
+        total = 0
+        for _day, count in storage.count_scans_by_day():
+            self._section_starts.append(total)
+            total += count
+        self._n_items = total
+        self._pages.clear()
+
+    def _page(self, index):
+        page = self._pages.get(index)
+        if page is None:
+            rows = storage.load_scan_summaries(index * self.PAGE_SIZE, self.PAGE_SIZE)
+            page = [ScanSummary(row) for row in rows]
+            self._pages[index] = page
+            if len(self._pages) > self.MAX_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(index)
+        return page
+
+    def do_get_item_type(self):
+        return ScanSummary
+
+    def do_get_n_items(self):
+        return self._n_items
+
+    def do_get_item(self, position):
+        if position >= self._n_items:
+            return None
+        page = self._page(position // self.PAGE_SIZE)
+        offset = position % self.PAGE_SIZE
+        return page[offset] if offset < len(page) else None
+
+    def do_get_section(self, position):
+        if position >= self._n_items:
+            return self._n_items, GLib.MAXUINT
+        index = bisect.bisect_right(self._section_starts, position) - 1
+        start = self._section_starts[index]
+        if index + 1 < len(self._section_starts):
+            return start, self._section_starts[index + 1]
+        return start, self._n_items
+
+    def delete(self, position):
+        """Delete the scan at position from storage and from the list."""
+        item = self.get_item(position)
+        if item is None:
+            return
+        storage.delete_scan(item.scan_id)
+        self._load_sections()
+        self.items_changed(position, 1, 0)
@@ -18,8 +18,13 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 
 import random
+import selectors
 import socket
 import struct
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 
 def _encode_dns_name(name):
@@ -53,46 +58,34 @@ def _decode_dns_name(data, offset):
     return ".".join(labels), (resume_at if jumped else offset)
 
 
-def resolve_mdns_hostname(ip, timeout=0.4):
-    """Query mDNS for the reverse (PTR) name of an IP. Returns hostname or None."""
+def _mdns_query(ip, txid):
     reversed_name = ".".join(reversed(ip.split("."))) + ".in-addr.arpa"
-    txid = random.randint(0, 0xFFFF)
     header = struct.pack(">HHHHHH", txid, 0x0000, 1, 0, 0, 0)
     # Top bit of qclass set = "QU" (unicast-response) so we get a direct reply
     question = _encode_dns_name(reversed_name) + struct.pack(">HH", 12, 0x8001)
-    packet = header + question
+    return header + question
 
-    sock = None
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(timeout)
-        sock.sendto(packet, ("224.0.0.251", 5353))
 
-        while True:
-            data, addr = sock.recvfrom(4096)
-            if addr[0] != ip:
-                continue
-            ancount = struct.unpack_from(">H", data, 6)[0]
-            if ancount < 1:
-                continue
+def _parse_mdns_ptr(data):
+    """Return (name, ttl) for the PTR record in an mDNS answer, or (None, 0)."""
+    qdcount, ancount = struct.unpack_from(">HH", data, 4)
+    if ancount < 1:
+        return None, 0
 
-            offset = 12
-            _, offset = _decode_dns_name(data, offset)
-            offset += 4  # qtype + qclass
-
-            for _ in range(ancount):
-                _, offset = _decode_dns_name(data, offset)
-                rtype, _, _, rdlength = struct.unpack_from(">HHIH", data, offset)
-                offset += 10
-                if rtype == 12:  # PTR
-                    name, _ = _decode_dns_name(data, offset)
-                    return name.rstrip(".") or None
-                offset += rdlength
-    except Exception:
-        return None
-    finally:
-        if sock:
-            sock.close()
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _decode_dns_name(data, offset)
+        offset += 4  # qtype + qclass
+
+    for _ in range(ancount):
+        _, offset = _decode_dns_name(data, offset)
+        rtype, _, ttl, rdlength = struct.unpack_from(">HHIH", data, offset)
+        offset += 10
+        if rtype == 12:  # PTR
+            name, _ = _decode_dns_name(data, offset)
+            return name.rstrip(".") or None, ttl
+        offset += rdlength
+    return None, 0
 
 
 def _encode_netbios_query_name():
@@ -101,61 +94,309 @@ def _encode_netbios_query_name():
     return bytes([32]) + encoded.encode() + b"\x00"
 
 
-def resolve_netbios_name(ip, timeout=0.4):
-    """Query NBNS (NetBIOS Node Status) for the host's name. Returns name or None."""
-    txid = random.randint(0, 0xFFFF)
+def _nbns_query(txid):
     header = struct.pack(">HHHHHH", txid, 0x0000, 1, 0, 0, 0)
     question = _encode_netbios_query_name() + struct.pack(">HH", 0x21, 0x01)
-    packet = header + question
+    return header + question
 
-    sock = None
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(timeout)
-        sock.sendto(packet, (ip, 137))
-        data, _ = sock.recvfrom(4096)
 
-        offset = 12
-        _, offset = _decode_dns_name(data, offset)
-        offset += 10  # type + class + ttl + rdlength
-        num_names = data[offset]
-        offset += 1
+def _parse_nbns_name(data):
+    """Return (name, ttl) from an NBNS Node Status answer, or (None, 0)."""
+    offset = 12
+    _, offset = _decode_dns_name(data, offset)
+    ttl = struct.unpack_from(">I", data, offset + 4)[0]
+    offset += 10  # type + class + ttl + rdlength
+    num_names = data[offset]
+    offset += 1
 
-        fallback = None
-        for _ in range(num_names):
-            raw_name = data[offset:offset + 15]
-            suffix = data[offset + 15]
-            flags = struct.unpack_from(">H", data, offset + 16)[0]
-            offset += 18
+    fallback = None
+    for _ in range(num_names):
+        raw_name = data[offset:offset + 15]
+        suffix = data[offset + 15]
+        flags = struct.unpack_from(">H", data, offset + 16)[0]
+        offset += 18
 
-            name = raw_name.decode("ascii", errors="replace").strip()
-            if not name or name == "*":
-                continue
-            is_group = bool(flags & 0x8000)
-            if suffix == 0x00 and not is_group:
-                return name
-            if fallback is None:
-                fallback = name
-        return fallback
-    except Exception:
-        return None
-    finally:
-        if sock:
-            sock.close()
+        name = raw_name.decode("ascii", errors="replace").strip()
+        if not name or name == "*":
+            continue
+        is_group = bool(flags & 0x8000)
+        if suffix == 0x00 and not is_group:
+            return name, ttl
+        if fallback is None:
+            fallback = name
+    return fallback, ttl
 
 
-def resolve_hostname(ip):
-    """Best-effort hostname resolution: reverse DNS, then mDNS, then NetBIOS."""
+def _reverse_dns(ip):
     try:
         return socket.gethostbyaddr(ip)[0]
     except Exception:
-        pass
+        return None
+
+
+MDNS = "mdns"
+NBNS = "nbns"
+
+
+class _Lookup:
+    __slots__ = ("ip", "mdns", "nbns", "ttls", "waiting")
+
+    def __init__(self, ip):
+        self.ip = ip
+        self.mdns = None
+        self.nbns = None
+        self.ttls = {}
+        self.waiting = {MDNS, NBNS}
+
+
+class HostnameCache:
+    """LRU cache of resolved hostnames with per-entry expiry.
+
+    Answers are stored by IP and, when the MAC is known, by MAC as well, so
+    a device that moved to a new DHCP lease keeps its name. An IP entry that
+    was recorded for a different MAC is ignored. Failed lookups are cached
+    too (as None) for negative_ttl seconds, so silent hosts aren't queried
+    again on every rescan.
+    """
+
+    def __init__(self, max_entries=4096, default_ttl=300, negative_ttl=120):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self._by_ip = OrderedDict()
+        self._by_mac = OrderedDict()
+        self._lock = threading.Lock()
 
-    name = resolve_mdns_hostname(ip)
-    if name:
-        return name
+    def _get(self, table, key, now):
+        entry = table.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del table[key]
+            return None
+        table.move_to_end(key)
+        return entry
 
-    return resolve_netbios_name(ip)
+    def get(self, ip, mac=None):
+        """Return (hit, name); name is None for a cached miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._get(self._by_ip, ip, now)
+            if entry is not None and (not mac or not entry[2] or entry[2] == mac):
+                return True, entry[0]
+            if mac:
+                entry = self._get(self._by_mac, mac, now)
+                if entry is not None:
+                    return True, entry[0]
+        return False, None
+
+    def put(self, ip, name, ttl=None, mac=None):
+        if name:
+            ttl = ttl or self.default_ttl
+        else:
+            ttl = self.negative_ttl
+        entry = (name, time.monotonic() + ttl, mac or "")
+        with self._lock:
+            self._by_ip[ip] = entry
+            self._by_ip.move_to_end(ip)
+            if mac and name:
+                self._by_mac[mac] = entry
+                self._by_mac.move_to_end(mac)
+            for table in (self._by_ip, self._by_mac):
+                while len(table) > self.max_entries:
+                    table.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._by_ip.clear()
+            self._by_mac.clear()
+
+
+class HostnameResolver:
+    """Resolve batches of IPs with reverse DNS, mDNS and NetBIOS at once.
+
+    All mDNS queries go out over one shared socket and all NBNS queries
+    over another. A single receiver thread reads both and hands each answer
+    to the waiting lookup by transaction ID, so a batch of silent hosts
+    costs one timeout in total rather than one per host and protocol.
+
+    The sockets and threads live until close(), so one resolver is meant
+    to be shared by every scan in a process.
+    """
+
+    def __init__(self, timeout=0.4, rdns_workers=32, cache=None):
+        self.timeout = timeout
+        self.cache = cache if cache is not None else HostnameCache()
+        self._rdns_pool = ThreadPoolExecutor(max_workers=rdns_workers)
+        self._cond = threading.Condition()
+        # (protocol, txid) -> _Lookup, plus a by-address fallback for
+        # responders that don't echo the transaction ID.
+        self._by_txid = {}
+        self._by_addr = {}
+        self._sockets = None
+        self._socket_lock = threading.Lock()
+        self._receiver = None
+        self._wakeup = None
+        self._closed = False
+
+    def _ensure_sockets(self):
+        with self._socket_lock:
+            if self._closed:
+                raise RuntimeError("HostnameResolver is closed")
+            if self._sockets is not None:
+                return self._sockets
+            mdns_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            nbns_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            for sock in (mdns_sock, nbns_sock):
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            self._sockets = {MDNS: mdns_sock, NBNS: nbns_sock}
+            # Writing to the other end wakes the receiver up to stop.
+            self._wakeup = socket.socketpair()
+            self._receiver = threading.Thread(target=self._receive_loop, daemon=True)
+            self._receiver.start()
+            return self._sockets
+
+    def close(self):
+        """Stop the receiver thread and release the sockets and workers."""
+        with self._socket_lock:
+            if self._closed:
+                return
+            self._closed = True
+            receiver = self._receiver
+            if receiver is not None:
+                self._wakeup[1].send(b"\0")
+        if receiver is not None:
+            receiver.join()
+            for sock in (*self._sockets.values(), *self._wakeup):
+                sock.close()
+        # Workers still inside gethostbyaddr() exit once it returns.
+        self._rdns_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _receive_loop(self):
+        with selectors.DefaultSelector() as selector:
+            for protocol, sock in self._sockets.items():
+                selector.register(sock, selectors.EVENT_READ, protocol)
+            selector.register(self._wakeup[0], selectors.EVENT_READ, None)
+            while True:
+                for key, _ in selector.select():
+                    if key.data is None:
+                        return
+                    try:
+                        data, addr = key.fileobj.recvfrom(4096)
+                    except OSError:
+                        continue
+                    self._dispatch(key.data, data, addr[0])
+
+    def _dispatch(self, protocol, data, source):
+        if len(data) < 12:
+            return
+        txid = struct.unpack_from(">H", data, 0)[0]
+        with self._cond:
+            lookup = self._by_txid.get((protocol, txid))
+            if lookup is None or lookup.ip != source:
+                lookup = self._by_addr.get((protocol, source))
+            if lookup is None or protocol not in lookup.waiting:
+                return
+
+        try:
+            name, ttl = _parse_mdns_ptr(data) if protocol == MDNS else _parse_nbns_name(data)
+        except Exception:
+            name, ttl = None, 0
+
+        with self._cond:
+            setattr(lookup, protocol, name)
+            lookup.ttls[protocol] = ttl
+            lookup.waiting.discard(protocol)
+            self._cond.notify_all()
+
+    def _new_txid(self, protocol):
+        while True:
+            txid = random.randint(0, 0xFFFF)
+            if (protocol, txid) not in self._by_txid:
+                return txid
+
+    def resolve_many(self, ips, macs=None):
+        """Return {ip: hostname or None} for the given IPs.
+
+        Answers are merged in the usual priority order: reverse DNS, then
+        mDNS, then NetBIOS. Cached answers (including cached misses) are
+        returned without going to the network; macs optionally maps IPs to
+        MAC addresses for the cache.
+        """
+        macs = macs or {}
+        results = {}
+        ips_to_query = []
+        for ip in dict.fromkeys(ips):
+            hit, name = self.cache.get(ip, macs.get(ip))
+            if hit:
+                results[ip] = name
+            else:
+                ips_to_query.append(ip)
+        ips = ips_to_query
+        if not ips:
+            return results
+
+        rdns = {ip: self._rdns_pool.submit(_reverse_dns, ip) for ip in ips}
+        sockets = self._ensure_sockets()
+        lookups = [_Lookup(ip) for ip in ips]
+        keys = []
+
+        with self._cond:
+            for lookup in lookups:
+                for protocol in (MDNS, NBNS):
+                    txid = self._new_txid(protocol)
+                    self._by_txid[(protocol, txid)] = lookup
+                    self._by_addr[(protocol, lookup.ip)] = lookup
+                    keys.append((protocol, txid, lookup.ip))
+
+        for protocol, txid, ip in keys:
+            try:
+                if protocol == MDNS:
+                    sockets[MDNS].sendto(_mdns_query(ip, txid), ("224.0.0.251", 5353))
+                else:
+                    sockets[NBNS].sendto(_nbns_query(txid), (ip, 137))
+            except OSError:
+                with self._cond:
+                    self._by_txid[(protocol, txid)].waiting.discard(protocol)
+
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while any(lookup.waiting for lookup in lookups):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            for protocol, txid, ip in keys:
+                self._by_txid.pop((protocol, txid), None)
+                if self._by_addr.get((protocol, ip)) in lookups:
+                    del self._by_addr[(protocol, ip)]
+
+        for lookup in lookups:
+            name = rdns[lookup.ip].result()
+            ttl = None  # gethostbyaddr() doesn't expose the record TTL
+            for protocol in (MDNS, NBNS):
+                if not name:
+                    name = getattr(lookup, protocol)
+                    ttl = lookup.ttls.get(protocol)
+            self.cache.put(lookup.ip, name, ttl, macs.get(lookup.ip))
+            results[lookup.ip] = name
+        return results
+
+    def resolve(self, ip):
+        return self.resolve_many([ip])[ip]
+
+
+_default_resolver = None
+_default_resolver_lock = threading.Lock()
+
+
+def resolve_hostname(ip):
+    """Best-effort hostname resolution: reverse DNS, then mDNS, then NetBIOS."""
+    global _default_resolver
+    with _default_resolver_lock:
+        if _default_resolver is None:
+            _default_resolver = HostnameResolver()
+    return _default_resolver.resolve(ip)
 
 
 def read_arp_table():
@@ -28,9 +28,14 @@ gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, Gio, GLib, Gdk, GObject
 
 from .widgets import DeviceCard, PresetButton, ThemeSelector
-from .scanner import NetworkScanner
-from .models import Device
-from . import storage
+from .scanner import NetworkScanner, PHASE_DISCOVERY
+from .models import Device, ScanHistoryModel
+from .search import Query
+from . import diff
+
+# Lists longer than this are sorted and filtered a chunk at a time between
+# frames, so loading or searching a big scan doesn't block the UI.
+INCREMENTAL_THRESHOLD = 1000
 
 
 def _format_timestamp(iso_string):
@@ -89,6 +94,8 @@ class HomePage(Adw.NavigationPage):
 
         self.primary_popover.add_child(thread_box, "thread_count")
 
+        self.scanner.set_batch_size(self.settings.get_int('batch-size'))
+
         self._setup_apply_button_focus(self.ip_entry_row, self.ip_apply_button)
 
         self.setup_presets()
@@ -221,6 +228,7 @@ class ResultsPage(Adw.NavigationPage):
     export_button = Gtk.Template.Child()
     view_toggle_button = Gtk.Template.Child()
     sort_menu_button = Gtk.Template.Child()
+    changes_button = Gtk.Template.Child()
     sort_list = Gtk.Template.Child()
     sort_row_known = Gtk.Template.Child()
     sort_row_ip = Gtk.Template.Child()
@@ -233,32 +241,43 @@ class ResultsPage(Adw.NavigationPage):
     spinner = Gtk.Template.Child()
     progress_label = Gtk.Template.Child()
     timer_label = Gtk.Template.Child()
+    rate_label = Gtk.Template.Child()
     view_stack = Gtk.Template.Child()
-    flow_box = Gtk.Template.Child()
+    card_grid = Gtk.Template.Child()
+    search_bar = Gtk.Template.Child()
+    search_entry = Gtk.Template.Child()
     list_view = Gtk.Template.Child()
     empty_page = Gtk.Template.Child()
     error_page = Gtk.Template.Child()
 
-    def __init__(self, navigation_view, toast_overlay, scanner, settings):
+    def __init__(self, navigation_view, toast_overlay, scanner, settings, storage_writer):
         super().__init__()
 
         self.navigation_view = navigation_view
         self.toast_overlay = toast_overlay
         self.scanner = scanner
         self.settings = settings
+        self.storage_writer = storage_writer
         self.home_page = None
         self.clipboard = Gdk.Display.get_default().get_clipboard()
 
         self.current_ip_range = ""
 
         self._deep_scan = False
+        self._streaming = False
+        self._changes_only = False
+        self._query = Query()
+        self._record_generation = 0
 
         self.scan_start_time = None
         self.timer_source_id = None
 
         self.list_store = Gio.ListStore(item_type=Device)
         self._setup_column_view()
-        self.flow_box.bind_model(self.sort_model, self._create_card)
+        self._setup_card_grid()
+        # Typing anywhere on the page starts a search.
+        self.search_bar.connect_entry(self.search_entry)
+        self.search_bar.set_key_capture_widget(self)
         self._setup_responsive_header()
 
 
@@ -284,11 +303,35 @@ class ResultsPage(Adw.NavigationPage):
     def connect_home_page(self, home_page):
         self.home_page = home_page
 
-    def _create_card(self, device):
-        return DeviceCard(device, toast_overlay=self.toast_overlay)
+    def _setup_card_grid(self):
+        """Cards are recycled as the grid scrolls, so only the visible ones
+        exist, however many devices there are."""
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_card_setup)
+        factory.connect("bind", self.on_card_bind)
+        factory.connect("unbind", self.on_card_unbind)
+        self.card_grid.set_factory(factory)
+        self.card_grid.set_model(Gtk.NoSelection(model=self.sort_model))
+
+    def on_card_setup(self, factory, list_item):
+        list_item.set_activatable(False)
+        list_item.set_focusable(False)
+        list_item.set_child(DeviceCard(toast_overlay=self.toast_overlay, storage_writer=self.storage_writer))
+
+    def on_card_bind(self, factory, list_item):
+        list_item.get_child().bind(list_item.get_item())
+
+    def on_card_unbind(self, factory, list_item):
+        list_item.get_child().unbind()
 
     def _setup_column_view(self):
-        self.sort_model = Gtk.SortListModel(model=self.list_store)
+        self.change_filter = Gtk.CustomFilter.new(self._filter_device)
+        self.search_filter = Gtk.CustomFilter.new(self._search_device)
+        device_filter = Gtk.EveryFilter()
+        device_filter.append(self.change_filter)
+        device_filter.append(self.search_filter)
+        self.filter_model = Gtk.FilterListModel(model=self.list_store, filter=device_filter)
+        self.sort_model = Gtk.SortListModel(model=self.filter_model)
 
         self.column_view = Gtk.ColumnView()
         self.column_view.set_model(Gtk.NoSelection(model=self.sort_model))
@@ -304,11 +347,24 @@ class ResultsPage(Adw.NavigationPage):
             "ports": self._add_simple_column(_("Ports"), "ports-display", lambda d: d.ports_display, wrap=True, width=180),
             "services": self._add_simple_column(_("Services"), "services-display", lambda d: d.services_display, wrap=True, width=160),
             "os": self._add_simple_column(_("System Information"), "os-display", lambda d: d.os_display, wrap=True, width=180),
+            "changes": self._add_simple_column(_("Changes"), "change-display", lambda d: d.change_display, wrap=True, width=200),
         }
+        self.columns["changes"].set_visible(False)
 
         self.sort_model.set_sorter(self.column_view.get_sorter())
         self.column_view.get_sorter().connect("changed", lambda *_: self._update_sort_indicator())
 
+    def _filter_device(self, device):
+        """Devices that disappeared are only listed among the changes."""
+        if self._changes_only:
+            return bool(device.change_display)
+        return not device.gone
+
+    def _search_device(self, device):
+        if not self._query:
+            return True
+        return self._query.matches(device.search_keys, device.custom_name, device.known)
+
     def _add_status_column(self):
         factory = Gtk.SignalListItemFactory()
         factory.connect("setup", self.on_status_setup)
@@ -457,7 +513,7 @@ class ResultsPage(Adw.NavigationPage):
 
     def _on_custom_name_committed(self, item, entry):
         """Persist a custom name once the user commits (Enter or apply button)"""
-        storage.set_custom_name(item.registry_key, item.custom_name)
+        self.storage_writer.set_custom_name(item.registry_key, item.custom_name)
         root = entry.get_root()
         if root:
             root.set_focus(None)
@@ -590,6 +646,24 @@ class ResultsPage(Adw.NavigationPage):
         self.view_stack.set_visible_child_name('list' if is_list else 'cards')
         self.settings.set_string('view-mode', 'list' if is_list else 'cards')
 
+    @Gtk.Template.Callback()
+    def on_changes_toggled(self, button):
+        self._changes_only = button.get_active()
+        self.change_filter.changed(Gtk.FilterChange.DIFFERENT)
+
+    @Gtk.Template.Callback()
+    def on_search_changed(self, entry):
+        """Re-filter for the new query, re-checking as few devices as possible"""
+        previous, self._query = self._query, Query(entry.get_text())
+        if previous.narrows(self._query):
+            change = Gtk.FilterChange.LESS_STRICT
+        elif self._query.narrows(previous):
+            change = Gtk.FilterChange.MORE_STRICT
+        else:
+            change = Gtk.FilterChange.DIFFERENT
+        self.filter_model.set_incremental(self.list_store.get_n_items() > INCREMENTAL_THRESHOLD)
+        self.search_filter.changed(change)
+
     def copy_to_clipboard(self, text):
         """Copy text to clipboard"""
         self.clipboard.set(text)
@@ -637,6 +711,8 @@ class ResultsPage(Adw.NavigationPage):
 
                 writer.writeheader()
                 for device in self.list_store:
+                    if device.gone:
+                        continue
                     writer.writerow({
                         'IP Address': device.ip,
                         'Hostname': device.hostname,
@@ -686,15 +762,68 @@ class ResultsPage(Adw.NavigationPage):
             self.timer_label.set_text(timer_text)
         return True
 
-    def on_progress_update(self, hosts_scanned, total_hosts):
+    @staticmethod
+    def _format_duration(seconds):
+        seconds = int(seconds)
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        if hours:
+            return f"{hours}:{minutes:02d}:{seconds:02d}"
+        return f"{minutes:02d}:{seconds:02d}"
+
+    def on_progress_update(self, hosts_scanned, total_hosts, phase=None, rate=0.0, eta=None):
         """Handle progress updates from the scanner"""
-        progress_text = _("Hosts Scanned: {scanned}/{total}").format(
-            scanned=hosts_scanned,
-            total=total_hosts
-        )
+        if rate > 0 and eta is not None:
+            self.rate_label.set_text(_("{rate} hosts/s · {eta} remaining").format(
+                rate=f"{rate:.0f}" if rate >= 10 else f"{rate:.1f}",
+                eta=self._format_duration(eta)
+            ))
+            self.rate_label.set_visible(True)
+        else:
+            self.rate_label.set_visible(False)
+
+        if phase == PHASE_DISCOVERY:
+            progress_text = _("Discovering Hosts: {scanned}/{total}").format(
+                scanned=hosts_scanned,
+                total=total_hosts
+            )
+        else:
+            progress_text = _("Hosts Scanned: {scanned}/{total}").format(
+                scanned=hosts_scanned,
+                total=total_hosts
+            )
         self.progress_label.set_text(progress_text)
 
+        # Once streamed devices are on screen the loading page is hidden, so
+        # carry the progress in the subtitle instead.
+        if self._streaming and self.results_stack.get_visible_child_name() == "devices":
+            self.results_title.set_subtitle(f"{self._scan_mode_label()}: {self.current_ip_range} · {progress_text}")
+
+    def _scan_mode_label(self):
+        return _("Deep scanning") if self._deep_scan else _("Scanning")
+
+    def on_scan_results(self, devices):
+        """Append a batch of devices streamed in while the scan is running"""
+        if not self._streaming:
+            return
+        generation = self._record_generation
+
+        def on_annotated(annotated):
+            # The scan may have finished, stopped or been replaced meanwhile.
+            if not self._streaming or generation != self._record_generation:
+                return
+            batch = [Device(data) for data in annotated]
+            self.list_store.splice(self.list_store.get_n_items(), 0, batch)
+            self._update_column_visibility(batch, only_reveal=True)
+            if self.results_stack.get_visible_child_name() == "loading":
+                self.results_stack.set_visible_child_name("devices")
+                self.view_toggle_button.set_sensitive(True)
+                self.sort_menu_button.set_sensitive(True)
+
+        self.storage_writer.annotate_devices(devices, on_annotated)
+
     def start_scan(self, ip_range, deep_scan=False):
+        self._record_generation += 1
         self.current_ip_range = ip_range
         self._deep_scan = deep_scan
 
@@ -706,27 +835,31 @@ class ResultsPage(Adw.NavigationPage):
         self.sort_menu_button.set_sensitive(False)
 
         self.list_store.remove_all()
+        self._reset_changes()
 
         self.results_stack.set_visible_child_name("loading")
         self.progress_label.set_text(_("Preparing scan..."))
         self.timer_label.set_text(_("Time Elapsed: 00:00"))
+        self.rate_label.set_visible(False)
 
         self.start_timer()
 
-        scan_mode = _("Deep scanning") if deep_scan else _("Scanning")
-        self.results_title.set_subtitle(f"{scan_mode}: {ip_range}")
+        self.results_title.set_subtitle(f"{self._scan_mode_label()}: {ip_range}")
 
+        self._streaming = True
         self.scanner.scan_network(
             ip_range,
             self.on_scan_complete,
             self.on_scan_error,
             self.on_progress_update,
             deep_scan=deep_scan,
+            results_callback=self.on_scan_results,
         )
 
     @Gtk.Template.Callback()
     def on_stop_clicked(self, button):
         """Handle stop scanning button click"""
+        self._streaming = False
         self.scanner.stop_scan()
         self.stop_button.set_visible(False)
         self.rescan_button.set_sensitive(True)
@@ -738,11 +871,7 @@ class ResultsPage(Adw.NavigationPage):
 
         partial = self.scanner.get_partial_results()
         if partial:
-            annotated = storage.record_scan(self.current_ip_range, partial, deep_scan=self._deep_scan)
-            self._display_devices(annotated)
-            scan_mode = _("Deep") + " · " if self._deep_scan else ""
-            self.results_title.set_subtitle(scan_mode + _("Scan stopped - Found {count} devices").format(count=len(annotated)))
-            self.export_button.set_sensitive(True)
+            self._record_scan(partial, _("Scan stopped - Found {count} devices"))
         else:
             self._display_devices([])
             self.results_title.set_subtitle(_("Scan stopped - No devices found"))
@@ -762,38 +891,116 @@ class ResultsPage(Adw.NavigationPage):
         else:
             self.show_toast(_(message))
 
-    def load_from_history(self, ip_range, devices_data, deep_scan=False):
+    def load_from_history(self, ip_range, devices_data, deep_scan=False, scan_id=None):
         """Load a previously saved scan without rescanning"""
+        self._record_generation += 1
+        generation = self._record_generation
         self.current_ip_range = ip_range
         self._deep_scan = deep_scan
         scan_mode = _("Deep") + " · " if deep_scan else ""
         self.results_title.set_subtitle(scan_mode + _("Loaded from history: ") + ip_range)
-        devices_data = storage.apply_custom_names(devices_data)
-        self._display_devices(devices_data)
-        self.export_button.set_sensitive(bool(devices_data))
-        self.view_toggle_button.set_sensitive(bool(devices_data))
-        self.sort_menu_button.set_sensitive(bool(devices_data))
+
+        def on_loaded(previous, refreshed):
+            if generation != self._record_generation:
+                return
+            self._display_devices(refreshed)
+            self._show_changes(previous, refreshed)
+            self.export_button.set_sensitive(bool(refreshed))
+            self.view_toggle_button.set_sensitive(bool(refreshed))
+            self.sort_menu_button.set_sensitive(bool(refreshed))
+
+        self.storage_writer.load_saved_scan(ip_range, devices_data, scan_id, on_loaded)
 
     def _display_devices(self, devices_data):
         """Populate the shared list store and switch to the right stack page"""
-        self.list_store.remove_all()
-        for data in devices_data:
-            self.list_store.append(Device(data))
-
-        has_services = any(device.services_display for device in self.list_store)
-        self.columns["services"].set_visible(has_services)
-        self.sort_row_services.set_visible(has_services)
+        self._reset_changes()
+        # Build every Device first and swap them in with one items-changed,
+        # instead of re-sorting and re-rendering once per device.
+        devices = [Device(data) for data in devices_data]
+        incremental = len(devices) > INCREMENTAL_THRESHOLD
+        self.sort_model.set_incremental(incremental)
+        self.filter_model.set_incremental(incremental)
+        self.list_store.splice(0, self.list_store.get_n_items(), devices)
 
-        has_os = any(device.deep_scanned for device in self.list_store)
-        self.columns["os"].set_visible(has_os)
-        self.sort_row_os.set_visible(has_os)
+        self._update_column_visibility(self.list_store)
 
         if devices_data:
             self.results_stack.set_visible_child_name("devices")
         else:
             self.results_stack.set_visible_child_name("empty")
 
+    def _reset_changes(self):
+        self.changes_button.set_active(False)
+        self.changes_button.set_sensitive(False)
+        self.columns["changes"].set_visible(False)
+
+    @staticmethod
+    def _describe_changes(found):
+        """Turn one device's {kind: detail} changes into a short sentence."""
+        parts = []
+        if diff.NEW in found:
+            parts.append(_("New since the previous scan"))
+        if diff.IP_CHANGED in found:
+            parts.append(_("IP changed from {ip}").format(ip=found[diff.IP_CHANGED]))
+        if diff.HOSTNAME_CHANGED in found:
+            parts.append(_("Hostname changed from {name}").format(name=found[diff.HOSTNAME_CHANGED]))
+        if diff.PORTS_OPENED in found:
+            parts.append(_("Opened {ports}").format(ports=", ".join(map(str, found[diff.PORTS_OPENED]))))
+        if diff.PORTS_CLOSED in found:
+            parts.append(_("Closed {ports}").format(ports=", ".join(map(str, found[diff.PORTS_CLOSED]))))
+        return "; ".join(parts)
+
+    def _show_changes(self, previous, devices_data):
+        """Diff the displayed devices against the previous scan of the range
+        and enable the changes filter."""
+        if previous is None:
+            return
+        scan_diff = diff.diff_scans(previous["devices"], devices_data)
+
+        for device in self.list_store:
+            found = scan_diff.changes.get(device.registry_key)
+            if found:
+                device.change_display = self._describe_changes(found)
+
+        # previous comes with its custom names already refreshed.
+        gone = []
+        for data in scan_diff.gone:
+            device = Device(data)
+            device.gone = True
+            device.change_display = _("Gone since the previous scan")
+            gone.append(device)
+        self.list_store.splice(self.list_store.get_n_items(), 0, gone)
+
+        counts = scan_diff.counts()
+        if scan_diff:
+            summary = _("{new} new · {gone} gone · {changed} changed").format(
+                new=counts[diff.NEW], gone=counts[diff.GONE], changed=counts["changed"])
+        else:
+            summary = _("No changes")
+        self.results_title.set_subtitle(self.results_title.get_subtitle() + " · " + summary)
+
+        self.changes_button.set_sensitive(bool(scan_diff))
+        self.columns["changes"].set_visible(bool(scan_diff))
+        self.change_filter.changed(Gtk.FilterChange.DIFFERENT)
+
+    def _update_column_visibility(self, devices, only_reveal=False):
+        """Only show the services and OS columns when some device has them.
+
+        With only_reveal, columns are shown if the given devices need them
+        but never hidden, which is what incremental batches want.
+        """
+        has_services = any(device.services_display for device in devices)
+        if has_services or not only_reveal:
+            self.columns["services"].set_visible(has_services)
+            self.sort_row_services.set_visible(has_services)
+
+        has_os = any(device.deep_scanned for device in devices)
+        if has_os or not only_reveal:
+            self.columns["os"].set_visible(has_os)
+            self.sort_row_os.set_visible(has_os)
+
     def on_scan_complete(self, devices):
+        self._streaming = False
         self.rescan_button.set_sensitive(True)
         self.rescan_button_content.set_label(_("Rescan"))
         self.stop_button.set_visible(False)
@@ -804,10 +1011,7 @@ class ResultsPage(Adw.NavigationPage):
         self.stop_timer()
 
         if devices:
-            annotated = storage.record_scan(self.current_ip_range, devices, deep_scan=self._deep_scan)
-            self._display_devices(annotated)
-            scan_mode = _("Deep") + " · " if self._deep_scan else ""
-            self.results_title.set_subtitle(scan_mode + _("Found {count} devices").format(count=len(annotated)))
+            self._record_scan(devices, _("Found {count} devices"))
         else:
             self._display_devices([])
             self.results_title.set_subtitle(_("No devices found"))
@@ -815,7 +1019,28 @@ class ResultsPage(Adw.NavigationPage):
             self.export_button.set_sensitive(False)
             self.sort_menu_button.set_sensitive(False)
 
+    def _record_scan(self, devices, summary):
+        """Save the scan in the background, then show the annotated devices
+        and what changed. summary is formatted with the device count."""
+        self._record_generation += 1
+        generation = self._record_generation
+        scan_mode = _("Deep") + " · " if self._deep_scan else ""
+        self.results_title.set_subtitle(scan_mode + summary.format(count=len(devices)))
+        self.export_button.set_sensitive(True)
+
+        def on_recorded(previous, annotated):
+            # A newer scan or a history entry may have replaced this one.
+            if generation != self._record_generation:
+                return
+            self._display_devices(annotated)
+            self.results_title.set_subtitle(scan_mode + summary.format(count=len(annotated)))
+            self._show_changes(previous, annotated)
+
+        self.storage_writer.record_scan(self.current_ip_range, devices, deep_scan=self._deep_scan,
+                                        callback=on_recorded)
+
     def on_scan_error(self, error_message):
+        self._streaming = False
         self.rescan_button.set_sensitive(True)
         self.rescan_button_content.set_label(_("Rescan"))
         self.stop_button.set_visible(False)
@@ -878,22 +1103,15 @@ class HistoryDialog(Adw.Dialog):
             vadj.set_value(min(HistoryDialog._saved_scroll_y, vadj.get_upper() - vadj.get_page_size()))
         return False
 
-    @staticmethod
-    def _make_header_row(title):
-        """Create a date section header compatible with all Libadwaita versions."""
-        label = Gtk.Label(label=title)
+    def _on_header_setup(self, factory, list_header):
+        label = Gtk.Label()
         label.set_halign(Gtk.Align.START)
-        label.set_margin_start(16)
-        label.set_margin_end(16)
-        label.set_margin_top(24)
-        label.set_margin_bottom(6)
         label.add_css_class('heading')
-        row = Gtk.ListBoxRow()
-        row.set_selectable(False)
-        row.set_activatable(False)
-        row.set_can_focus(False)
-        row.set_child(label)
-        return row
+        list_header.set_child(label)
+
+    def _on_header_bind(self, factory, list_header):
+        scan = list_header.get_item()
+        list_header.get_child().set_label(self._format_date_header(scan.timestamp))
 
     @staticmethod
     def _format_date_header(iso_string):
@@ -918,101 +1136,64 @@ class HistoryDialog(Adw.Dialog):
             return iso_string
 
     def _populate(self):
-        scans = storage.load_scans()
-        if not scans:
+        self.model = ScanHistoryModel()
+        if self.model.get_n_items() == 0:
             self.history_stack.set_visible_child_name('empty')
             return
 
         self.history_stack.set_visible_child_name('list')
 
-        GLib.idle_add(self._restore_scroll)
+        factory = Gtk.SignalListItemFactory()
+        factory.connect('setup', self._on_row_setup)
+        factory.connect('bind', self._on_row_bind)
+        header_factory = Gtk.SignalListItemFactory()
+        header_factory.connect('setup', self._on_header_setup)
+        header_factory.connect('bind', self._on_header_bind)
 
-        # Group scans by date (newest-first from storage)
-        groups = {}
-        for scan in scans:
-            ts = scan.get('timestamp', '')
-            try:
-                dt = datetime.fromisoformat(ts)
-                date_key = dt.astimezone().date().isoformat()
-            except ValueError:
-                date_key = ts
-            groups.setdefault(date_key, []).append(scan)
-
-        # Sort date groups newest-first
-        for date_key in sorted(groups.keys(), reverse=True):
-            scans_in_group = groups[date_key]
-            # Build a header row for this date
-            header = self._make_header_row(
-                self._format_date_header(scans_in_group[0].get('timestamp', ''))
-            )
-            self.history_list.append(header)
-            # Add scan rows under this date header
-            for scan in scans_in_group:
-                self.history_list.append(self._build_row(scan))
+        self.history_list.set_factory(factory)
+        self.history_list.set_header_factory(header_factory)
+        self.history_list.set_model(Gtk.NoSelection(model=self.model))
+
+        GLib.idle_add(self._restore_scroll)
 
-    def _build_row(self, scan):
+    def _on_row_setup(self, factory, list_item):
         row = Adw.ActionRow()
-        row.set_title(scan.get('ip_range', ''))
-        device_count = len(scan.get('devices', []))
-        # Extract just the time from the ISO timestamp
-        try:
-            ts_dt = datetime.fromisoformat(scan.get('timestamp', ''))
-            time_str = ts_dt.astimezone().strftime('%H:%M')
-        except ValueError:
-            time_str = ""
-        deep_suffix = " · " + _("Deep") if scan.get("deep_scan", False) else ""
-        row.set_subtitle(_("{time} · {count} devices{deep}").format(
-            time=time_str, count=device_count, deep=deep_suffix))
-        row.set_activatable(True)
-        row.scan_data = scan
 
         delete_button = Gtk.Button()
         delete_button.set_icon_name('user-trash-symbolic')
         delete_button.set_tooltip_text(_("Delete this scan"))
         delete_button.set_valign(Gtk.Align.CENTER)
         delete_button.add_css_class('flat')
-        delete_button.connect('clicked', self._on_delete_clicked, row)
+        delete_button.connect('clicked', self._on_delete_clicked, list_item)
         row.add_suffix(delete_button)
 
         row.add_suffix(Gtk.Image.new_from_icon_name('go-next-symbolic'))
-        return row
-
-    def _on_delete_clicked(self, button, row):
-        scan_data = getattr(row, 'scan_data', None)
-        if not scan_data:
-            return
-
-        storage.delete_scan(scan_data.get('timestamp', ''))
-
-        # Find the header row above this scan row
-        header = row.get_prev_sibling()
-        self.history_list.remove(row)
+        list_item.set_child(row)
 
-        # If the header's section is now empty, remove the header too
-        if header is not None and not header.get_selectable():
-            next_sibling = header.get_next_sibling()
-            if next_sibling is None or not next_sibling.get_selectable():
-                self.history_list.remove(header)
+    def _on_row_bind(self, factory, list_item):
+        scan = list_item.get_item()
+        row = list_item.get_child()
+        row.set_title(scan.ip_range)
+        # Extract just the time from the ISO timestamp
+        try:
+            ts_dt = datetime.fromisoformat(scan.timestamp)
+            time_str = ts_dt.astimezone().strftime('%H:%M')
+        except ValueError:
+            time_str = ""
+        deep_suffix = " · " + _("Deep") if scan.deep_scan else ""
+        row.set_subtitle(_("{time} · {count} devices{deep}").format(
+            time=time_str, count=scan.device_count, deep=deep_suffix))
 
-        # Check if any selectable (scan) rows remain
-        has_scan = False
-        child = self.history_list.get_first_child()
-        while child is not None:
-            if child.get_selectable():
-                has_scan = True
-                break
-            child = child.get_next_sibling()
-        if not has_scan:
+    def _on_delete_clicked(self, button, list_item):
+        self.model.delete(list_item.get_position())
+        if self.model.get_n_items() == 0:
             self.history_stack.set_visible_child_name('empty')
 
     @Gtk.Template.Callback()
-    def on_scan_row_activated(self, listbox, row):
-        # Skip header rows — they're not activatable
-        if not row.get_selectable():
-            return
-        scan_data = getattr(row, 'scan_data', None)
-        if scan_data:
-            self._on_select(scan_data)
+    def on_scan_activated(self, list_view, position):
+        scan = self.model.get_item(position)
+        if scan is not None:
+            self._on_select(scan.scan_id)
             self.close()
 
     @Gtk.Template.Callback()
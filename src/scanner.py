@@ -17,18 +17,194 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import asyncio
+import itertools
 import threading
 import ipaddress
 import socket
 import struct
-import nmap
-from concurrent.futures import ThreadPoolExecutor
-from gi.repository import GLib
+import time
+import queue
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 from . import netinfo
+from .connectscan import ConnectScanner, fd_budget
+from .discovery import HostDiscovery
+from .iprange import IPRangeSet
+
+# Scan phases reported alongside progress
+PHASE_DISCOVERY = "discovery"
+PHASE_PORTS = "ports"
+
+# Live hosts are handed to the hostname resolver in batches of up to
+# RESOLVE_BATCH, or after RESOLVE_DELAY seconds, whichever comes first.
+RESOLVE_BATCH = 256
+RESOLVE_DELAY = 0.05
+
+# How often newly found devices are pushed to the results callback.
+STREAM_INTERVAL = 0.1
+
+# Live hosts reach nmap in batches of up to batch_size, or BATCH_DELAY
+# seconds after the first of a batch was found, whichever comes first.
+BATCH_DELAY = 0.25
+
+# Queued by scan_network() to tell the result collector the scan is over.
+_SCAN_FINISHED = object()
+
+# How often progress is published to the progress callback (10 fps).
+PROGRESS_INTERVAL = 0.1
+
+
+def call_directly(callback, *args):
+    """Default dispatcher: run callbacks right away, on the scanning threads."""
+    callback(*args)
+
+
+def asyncio_dispatcher(loop):
+    """Return a dispatcher that runs callbacks on the given asyncio loop."""
+    def dispatch(callback, *args):
+        loop.call_soon_threadsafe(callback, *args)
+    return dispatch
+
+
+class ProgressAggregator:
+    """Count scanned hosts and publish progress at a fixed rate.
+
+    Workers only bump a counter; a ticker thread publishes a snapshot of
+    (scanned, total, phase, hosts/sec, ETA seconds or None) through a single
+    dispatched callback per tick, and only when something changed.
+
+    Every phase has its own counter, so phases can overlap: port probes
+    are counted while discovery is still the phase being published.
+    """
+
+    def __init__(self, callback, interval=PROGRESS_INTERVAL, dispatch=call_directly):
+        self.callback = callback
+        self.interval = interval
+        self.dispatch = dispatch
+        self.phase = PHASE_PORTS
+        # phase -> [scanned, total, start time]
+        self._counters = {PHASE_PORTS: [0, 0, time.monotonic()]}
+        self._lock = threading.Lock()
+        self._published = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def scanned(self):
+        return self._counters[self.phase][0]
+
+    @property
+    def total(self):
+        return self._counters[self.phase][1]
+
+    def start_phase(self, phase, total):
+        """Count a phase from zero and publish its progress from now on."""
+        with self._lock:
+            self.phase = phase
+            self._counters[phase] = [0, total, time.monotonic()]
+        self._start()
+
+    def show_phase(self, phase):
+        """Publish a phase that has been counted in the background so far."""
+        with self._lock:
+            self.phase = phase
+        self._start()
+
+    def _start(self):
+        self._publish()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def expect(self, count, phase):
+        """Add hosts to the total of a phase, e.g. as discovery finds them."""
+        with self._lock:
+            self._counters.setdefault(phase, [0, 0, time.monotonic()])[1] += count
+
+    def add(self, count=1, phase=None):
+        """Count scanned hosts of a phase (the published one by default)."""
+        with self._lock:
+            counter = self._counters.get(phase or self.phase)
+            if counter is not None:
+                counter[0] += count
+
+    def snapshot(self):
+        with self._lock:
+            phase = self.phase
+            scanned, total, started = self._counters[phase]
+            elapsed = time.monotonic() - started
+        rate = scanned / elapsed if elapsed > 0 else 0.0
+        eta = (total - scanned) / rate if rate > 0 else None
+        return scanned, total, phase, rate, eta
+
+    def _publish(self):
+        snapshot = self.snapshot()
+        # Rate and ETA drift every tick; only republish on real progress.
+        if self.callback and snapshot[:3] != self._published:
+            self._published = snapshot[:3]
+            self.dispatch(self.callback, *snapshot)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._publish()
+
+    def stop(self, publish=True):
+        """Stop ticking; publish the final state unless the scan was abandoned."""
+        self._stopped.set()
+        if publish:
+            self._publish()
+
+
+class _LiveHosts:
+    """Live hosts handed from a discovery thread to the nmap batches."""
+
+    _DONE = object()
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def put(self, ip, answered):
+        self._queue.put((ip, answered))
+
+    def close(self):
+        self._queue.put(self._DONE)
+
+    def batches(self, size):
+        """Yield (batch, answered) for up to size hosts at a time until
+        discovery is over, never holding one back more than BATCH_DELAY
+        after its first host. Hosts that answered a probe and hosts only
+        ARP vouched for never share a batch."""
+        done = False
+        while not done:
+            item = self._queue.get()
+            if item is self._DONE:
+                return
+            batch = [item]
+            deadline = time.monotonic() + BATCH_DELAY
+            while len(batch) < size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is self._DONE:
+                    done = True
+                    break
+                batch.append(item)
+            for answered in (True, False):
+                hosts = [ip for ip, flag in batch if flag == answered]
+                if hosts:
+                    yield hosts, answered
+
 
 class NetworkScanner:
-    """Network scanning functionality"""
+    """Network scanning functionality
+
+    Scans run on background threads. Every callback is handed to `dispatch`
+    as dispatch(callback, *args), which decides where it runs: the GTK app
+    passes GLib.idle_add to get them on the main loop, asyncio users can
+    pass asyncio_dispatcher(loop), and by default they are called directly.
+    """
 
     # Map of known service ports to service identifiers.
     # Only includes ports that are distinctive enough for a reliable guess.
@@ -47,16 +223,25 @@ class NetworkScanner:
         5001: "synology",
     }
 
-    def __init__(self):
+    def __init__(self, dispatch=call_directly, resolver=None):
+        """resolver is the netinfo.HostnameResolver to use; by default the
+        scanner gets its own. Share one between scanners that live side by
+        side, so they share its sockets, threads and cache."""
+        self.dispatch = dispatch
         self.common_ports = [22, 80, 443, 3389, 53, 21, 23, 8080, 8443, 8006, 5000, 5001, 445, 139, 9090, 3000, 3306, 5432, 6379, 8123, 32400, 9000, 631, 27017]
         self.is_scanning = False
         self._scan_generation = 0
-        self.hosts_scanned = 0
-        self.total_hosts = 0
         self.partial_results = []
-        self.lock = threading.Lock()
+        self._progress = ProgressAggregator(None)
+        self._results = queue.SimpleQueue()
 
         self.max_workers = 100
+        self.batch_size = 256
+        self.max_connections = 1024
+        self.connect_timeout = 1.0
+        self.discover_hosts = True
+        self.icmp_discovery = True
+        self.resolver = resolver if resolver is not None else netinfo.HostnameResolver()
 
     def set_max_workers(self, count):
         """Set the maximum number of worker threads"""
@@ -65,54 +250,89 @@ class NetworkScanner:
         else:
             print(_("Thread count must be between 1 and 500"))
 
+    def set_batch_size(self, count):
+        """Set the maximum number of hosts handed to a single nmap process"""
+        if 1 <= count <= 1024:
+            self.batch_size = count
+        else:
+            print(_("Batch size must be between 1 and 1024"))
+
+    def set_max_connections(self, count):
+        """Set how many TCP connects the fast scan keeps in flight at once"""
+        if 1 <= count <= 65536:
+            self.max_connections = count
+        else:
+            print(_("Connection limit must be between 1 and 65536"))
+
     def validate_ip_range(self, ip_range):
         if not ip_range:
             return False, _("Please enter an IP range")
 
         try:
-            if '/' in ip_range or '-' in ip_range:
-                pass
-            else:
-                ipaddress.IPv4Address(ip_range)
+            if not IPRangeSet.parse(ip_range):
+                return False, _("The range contains no addresses to scan")
             return True, _("Valid IP range")
         except Exception as e:
             return False, _("Invalid IP range: {e}").format(e=e)
 
-    def parse_ip_range_for_list(self, ip_range):
-        hosts = []
-        try:
-            if '/' in ip_range:
-                net = ipaddress.ip_network(ip_range, strict=False)
-                hosts = list(net.hosts())
-            elif '-' in ip_range:
-                base_ip, range_part = ip_range.rsplit('-', 1)
-                base_parts = base_ip.split('.')
-
-                if len(base_parts) == 4:
-                    base_network = '.'.join(base_parts[:3])
-                    start_ip = int(base_parts[3])
-                    end_ip = int(range_part)
-                elif len(base_parts) == 3:
-                    base_network = base_ip
-                    start_ip = 1
-                    end_ip = int(range_part)
-                else:
-                    raise ValueError(_("Invalid range format!"))
+    def parse_ip_range(self, ip_range):
+        """Parse a range (see IPRangeSet.parse) into an interval set.
 
-                hosts = [ipaddress.IPv4Address(f"{base_network}.{i}") for i in range(start_ip, end_ip + 1)]
-            else:
-                hosts = [ipaddress.IPv4Address(ip_range)]
+        Nothing is expanded here, so even a /8 costs a couple of integers.
+        """
+        try:
+            return IPRangeSet.parse(ip_range)
         except Exception as e:
             print(_("Error parsing IP range: {e}").format(e=e))
-            hosts = []
-        return hosts
+            return IPRangeSet()
+
+    def _run_batches(self, hosts, host_count, deep_scan=False, generation=None, assume_alive=False,
+                     ports=None):
+        """Feed nmap batches to the worker pool through a bounded window.
 
-    def scan_single_ip(self, host, devices, progress_callback=None, deep_scan=False, generation=None):
+        Batches never exceed batch_size, but small ranges are still spread
+        across the worker pool instead of landing in a single process. Only
+        a couple of batches per worker are queued at once, so memory stays
+        flat however large the range is.
+        """
+        per_worker = -(-host_count // self.max_workers)
+        size = max(1, min(self.batch_size, per_worker))
+        if isinstance(hosts, _LiveHosts):
+            batches = hosts.batches(size)
+        else:
+            hosts = iter(hosts)
+            batches = ((batch, assume_alive)
+                       for batch in iter(lambda: list(itertools.islice(hosts, size)), []))
+
+        def collect(futures):
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(_("An error occurred in a thread: {e}").format(e=e))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            for batch, batch_alive in batches:
+                if not self.is_scanning:
+                    break
+                pending.add(executor.submit(self.scan_batch, batch, deep_scan, generation,
+                                            batch_alive, ports))
+                if len(pending) >= 2 * self.max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            collect(pending)
+
+    def scan_batch(self, hosts, deep_scan=False, generation=None, assume_alive=False, ports=None):
+        """Scan a chunk of hosts with one nmap process and a single XML parse."""
         if not self.is_scanning:
             return
 
+        # Only deep scans go through nmap, so the fast path never needs it.
+        import nmap
+
         nm = nmap.PortScanner()
-        ports_str = ','.join(map(str, self.common_ports))
+        ports_str = ','.join(map(str, ports or self.common_ports))
         scan_arguments = f"-sT -p {ports_str}"
 
         if deep_scan:
@@ -121,98 +341,275 @@ class NetworkScanner:
             # SMB OS discovery and share enumeration (NSE scripts, no root needed)
             scan_arguments += " --script smb-os-discovery.nse"
 
+        if assume_alive:
+            # Discovery already ran, so skip nmap's own host ping.
+            scan_arguments += " -Pn"
+
+        targets = [str(host) for host in hosts]
         try:
-            nm.scan(hosts=str(host), arguments=scan_arguments)
+            nm.scan(hosts=' '.join(targets), arguments=scan_arguments)
+            scanned = set(nm.all_hosts())
         except nmap.nmap.PortScannerError as e:
-            print(_("Nmap error on host {host}: {e}").format(host=host, e=e))
-            return
+            print(_("Nmap error on hosts {first}-{last}: {e}").format(first=targets[0], last=targets[-1], e=e))
+            scanned = set()
 
-        if str(host) in nm.all_hosts():
-            host_info = nm[str(host)]
-            hostname = host_info.hostname() or None
-            open_ports = []
+        up_hosts = [host for host in targets
+                    if host in scanned and nm[host].state() == 'up']
+
+        # Names that nmap could not resolve are looked up as one batch, so
+        # silent hosts share a single mDNS/NBNS timeout.
+        unnamed = [host for host in up_hosts if not nm[host].hostname()]
+        resolved = self.resolver.resolve_many(unnamed, netinfo.read_arp_table())
 
+        for host in up_hosts:
+            host_info = nm[host]
+            hostname = host_info.hostname() or resolved.get(host)
+            open_ports = []
             if 'tcp' in host_info:
                 for port in host_info['tcp']:
                     if host_info['tcp'][port]['state'] == 'open':
                         open_ports.append(port)
             open_ports.sort()
 
-            if host_info.state() == 'up':
-                if not hostname:
-                    hostname = netinfo.resolve_hostname(str(host))
-                smb = 445 in open_ports or 139 in open_ports
-                services = list(dict.fromkeys(
-                    svc for port, svc in self.SERVICE_PORTS.items()
-                    if port in open_ports
-                ))
-
-                device = {
-                    "hostname": hostname or str(host),
-                    "ip": str(host),
-                    "ports": open_ports,
-                    "ports_display": ", ".join(map(str, open_ports)) if open_ports else _("No common ports open"),
-                    "smb": smb,
-                    "services": services,
-                    "os_display": "",
-                }
-
-                if deep_scan:
-                    self._enrich_deep_scan(host_info, device, open_ports)
-
-                device["deep_scanned"] = deep_scan
-
-                with self.lock:
-                    devices.append(device)
-                    if generation is None or generation == self._scan_generation:
-                        self.partial_results.append(device)
+            device = self._build_device(host, hostname, open_ports)
+            if deep_scan:
+                self._enrich_deep_scan(host_info, device, open_ports)
+            device["deep_scanned"] = deep_scan
+            self._add_device(device, generation)
+
+        self._count_scanned(len(targets), generation)
+
+    async def _discover(self, hosts, progress, generation=None, concurrency=None, unconfirmed=None):
+        """Discovery phase: yield each address that answers at all, as soon
+        as it does, growing the port phase's total to match.
 
-        with self.lock:
-            if generation is None or generation == self._scan_generation:
-                self.hosts_scanned += 1
-                if progress_callback:
-                    GLib.idle_add(progress_callback, self.hosts_scanned, self.total_hosts)
+        Addresses only ARP vouched for are also added to `unconfirmed`;
+        the port probes have to show those are up.
+        """
+        discovery = HostDiscovery(concurrency=concurrency or self.max_connections,
+                                  timeout=self.connect_timeout,
+                                  use_icmp=self.icmp_discovery)
+        async for ip, alive, answered in discovery.sweep(hosts, lambda: self.is_scanning):
+            self._count_scanned(1, generation, PHASE_DISCOVERY)
+            if alive:
+                if not answered and unconfirmed is not None:
+                    unconfirmed.add(ip)
+                progress.expect(1, PHASE_PORTS)
+                yield ip
+        progress.show_phase(PHASE_PORTS)
+
+    def _discover_into(self, hosts, live, progress, generation=None):
+        """Run discovery on this thread, handing live hosts to `live`."""
+        unconfirmed = set()
+
+        async def feed():
+            async for ip in self._discover(hosts, progress, generation, unconfirmed=unconfirmed):
+                live.put(ip, ip not in unconfirmed)
+
+        try:
+            asyncio.run(feed())
+        finally:
+            live.close()
 
-    def scan_network(self, ip_range, callback, error_callback, progress_callback=None, deep_scan=False):
+    async def _connect_sweep(self, hosts, generation=None, assume_alive=False, ports=None,
+                             concurrency=None, unconfirmed=()):
+        """Fast path: probe common ports with asyncio connects instead of nmap.
+
+        With assume_alive, hosts are reported even if no port answers,
+        except those in `unconfirmed`.
+        """
+        engine = ConnectScanner(ports or self.common_ports, concurrency or self.max_connections,
+                                self.connect_timeout)
+        loop = asyncio.get_running_loop()
+        finishing = set()
+        waiting = []
+
+        async def finish_batch(batch):
+            names = await loop.run_in_executor(
+                pool, self.resolver.resolve_many, [ip for ip, _ports in batch],
+                netinfo.read_arp_table())
+            for ip, open_ports in batch:
+                device = self._build_device(ip, names.get(ip), open_ports)
+                device["deep_scanned"] = False
+                self._add_device(device, generation)
+            self._count_scanned(len(batch), generation)
+
+        def flush():
+            if waiting:
+                task = asyncio.ensure_future(finish_batch(waiting[:]))
+                finishing.add(task)
+                task.add_done_callback(finishing.discard)
+                waiting.clear()
+
+        # The lookups block, so they run on the worker threads while the
+        # event loop keeps probing.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            async for ip, alive, open_ports in engine.sweep(hosts, lambda: self.is_scanning):
+                if alive or (assume_alive and ip not in unconfirmed):
+                    if not waiting:
+                        loop.call_later(RESOLVE_DELAY, flush)
+                    waiting.append((ip, open_ports))
+                    if len(waiting) >= RESOLVE_BATCH:
+                        flush()
+                else:
+                    self._count_scanned(1, generation)
+            flush()
+            while finishing:
+                await asyncio.gather(*finishing)
+
+    def _add_device(self, device, generation):
+        self._results.put((generation, device, 0, None))
+
+    def _count_scanned(self, count, generation, phase=PHASE_PORTS):
+        self._results.put((generation, None, count, phase))
+
+    @property
+    def hosts_scanned(self):
+        return self._progress.scanned
+
+    @property
+    def total_hosts(self):
+        return self._progress.total
+
+    @property
+    def phase(self):
+        return self._progress.phase
+
+    def _build_device(self, host, hostname, open_ports):
+        """Build the device dict shared by the nmap and connect scan paths."""
+        smb = 445 in open_ports or 139 in open_ports
+        services = list(dict.fromkeys(
+            svc for port, svc in self.SERVICE_PORTS.items()
+            if port in open_ports
+        ))
+
+        device = {
+            "hostname": hostname or host,
+            "ip": host,
+            "ports": open_ports,
+            "ports_display": ", ".join(map(str, open_ports)) if open_ports else _("No common ports open"),
+            "smb": smb,
+            "services": services,
+            "os_display": "",
+        }
+        return device
+
+    def _collect_results(self, generation, results, devices, results_callback=None):
+        """Single consumer of everything the workers report.
+
+        Workers only put (generation, device, scanned_count, phase) tuples on the
+        queue, so they never contend with each other or with readers of
+        partial_results. Only items of the current scan generation count;
+        anything left over from a stopped scan is dropped. Newly found
+        devices are pushed to results_callback every STREAM_INTERVAL.
+        """
+        current = lambda: generation == self._scan_generation
+        batch = []
+        next_flush = time.monotonic() + STREAM_INTERVAL
+        finished = False
+        while not finished:
+            try:
+                item = results.get(timeout=max(0.0, next_flush - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is _SCAN_FINISHED:
+                finished = True
+            elif item is not None and item[0] == generation:
+                _generation, device, scanned, phase = item
+                if device is not None:
+                    devices.append(device)
+                    if current():
+                        self.partial_results.append(device)
+                        batch.append(device)
+                if scanned and current():
+                    self._progress.add(scanned, phase)
+
+            if finished or time.monotonic() >= next_flush:
+                if batch and results_callback and current():
+                    self._enrich_with_arp(batch)
+                    self.dispatch(self._deliver_results, generation, results_callback, batch)
+                batch = []
+                next_flush = time.monotonic() + STREAM_INTERVAL
+
+    def _deliver_results(self, generation, results_callback, batch):
+        # Runs wherever dispatch puts it; drop batches queued before a stop
+        # or restart.
+        if generation == self._scan_generation:
+            results_callback(batch)
+        return False
+
+    def scan_network(self, ip_range, callback, error_callback, progress_callback=None, deep_scan=False,
+                     results_callback=None, ports=None):
+        """Scan ip_range in a background thread.
+
+        callback receives the full sorted device list once the scan is done.
+        If results_callback is given, devices are also delivered in batches
+        as they are found, before the final callback. ports overrides
+        common_ports for this scan only.
+        """
         def do_scan():
             try:
                 self.is_scanning = True
                 self.partial_results = []
-                self.hosts_scanned = 0
                 self._scan_generation += 1
                 gen = self._scan_generation
-
-                hosts_to_scan = self.parse_ip_range_for_list(ip_range)
-                self.total_hosts = len(hosts_to_scan)
-
-                if progress_callback:
-                    GLib.idle_add(progress_callback, 0, self.total_hosts)
+                progress = self._progress = ProgressAggregator(progress_callback, dispatch=self.dispatch)
+                results = self._results = queue.SimpleQueue()
 
                 devices = []
-
-                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    futures = []
-                    for host in hosts_to_scan:
-                        if not self.is_scanning:
-                            break
-                        future = executor.submit(self.scan_single_ip, host, devices, progress_callback, deep_scan, gen)
-                        futures.append(future)
-
-                    for future in futures:
-                        try:
-                            future.result()
-                        except Exception as e:
-                            print(_("An error occurred in a thread: {e}").format(e=e))
+                collector = threading.Thread(target=self._collect_results,
+                                             args=(gen, results, devices, results_callback), daemon=True)
+                collector.start()
+
+                ranges = self.parse_ip_range(ip_range)
+                hosts_to_scan = iter(ranges)
+                host_count = len(ranges)
+
+                # With discovery on, live hosts go straight on to port
+                # probing while the rest of the range is still being swept;
+                # the port phase's total grows as they are found.
+                try:
+                    if not self.discover_hosts:
+                        progress.start_phase(PHASE_PORTS, host_count)
+                        if deep_scan:
+                            self._run_batches(hosts_to_scan, host_count, deep_scan, gen, False, ports)
+                        else:
+                            asyncio.run(self._connect_sweep(hosts_to_scan, gen, False, ports))
+                    elif deep_scan:
+                        progress.start_phase(PHASE_DISCOVERY, host_count)
+                        live = _LiveHosts()
+                        discovery = threading.Thread(target=self._discover_into,
+                                                     args=(hosts_to_scan, live, progress, gen), daemon=True)
+                        discovery.start()
+                        self._run_batches(live, host_count, deep_scan, gen, True, ports)
+                        discovery.join()
+                    else:
+                        progress.start_phase(PHASE_DISCOVERY, host_count)
+                        # Both sweeps share one event loop, so they split one
+                        # connect budget, clamped to the open file limit once
+                        # for the two of them.
+                        connections = max(1, min(self.max_connections, fd_budget()) // 2)
+                        unconfirmed = set()
+                        live = self._discover(hosts_to_scan, progress, gen, connections, unconfirmed)
+                        asyncio.run(self._connect_sweep(live, gen, True, ports, connections, unconfirmed))
+                finally:
+                    # Drain what's left, flushing the last batch so it lands
+                    # before the final callback.
+                    results.put(_SCAN_FINISHED)
+                    collector.join()
+                    progress.stop(publish=gen == self._scan_generation)
 
                 if self.is_scanning and gen == self._scan_generation:
                     self.is_scanning = False
                     devices_sorted = sorted(devices, key=lambda x: ipaddress.IPv4Address(x['ip']))
                     self._enrich_with_arp(devices_sorted)
-                    GLib.idle_add(callback, devices_sorted)
+                    self.dispatch(callback, devices_sorted)
 
             except Exception as e:
                 self.is_scanning = False
-                GLib.idle_add(error_callback, _("Scan failed: {e}").format(e=e))
+                self._progress.stop(publish=False)
+                self.dispatch(error_callback, _("Scan failed: {e}").format(e=e))
 
         if not self.is_scanning:
             threading.Thread(target=do_scan, daemon=True).start()
@@ -220,6 +617,7 @@ class NetworkScanner:
     def stop_scan(self):
         self.is_scanning = False
         self._scan_generation += 1
+        self._progress.stop(publish=False)
 
     def get_partial_results(self):
         devices = sorted(self.partial_results, key=lambda x: ipaddress.IPv4Address(x['ip']))
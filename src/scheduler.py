@@ -0,0 +1,171 @@
+# scheduler.py
+#
+# Copyright 2026 ZingyTomato
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import random
+import threading
+import time
+
+from .scanner import NetworkScanner
+from .server import RUNNING
+from . import storage
+
+# What to do when a schedule comes due while its previous scan still runs.
+SKIP = "skip"
+QUEUE = "queue"
+
+# Seconds between re-reading the saved schedules, so schedules added or
+# removed with `netpeek-cli schedule` reach a running daemon.
+RELOAD_INTERVAL = 60
+
+
+def validate_schedule(ip_range, interval, ports=None, jitter=0, overlap=SKIP):
+    """Return (is_valid, message) for the settings of a schedule."""
+    is_valid, message = NetworkScanner().validate_ip_range(ip_range)
+    if not is_valid:
+        return False, message
+    if interval < 1:
+        return False, _("The interval must be at least one second")
+    if jitter < 0:
+        return False, _("The jitter can't be negative")
+    if ports and not all(1 <= port <= 65535 for port in ports):
+        return False, _("Ports must be between 1 and 65535")
+    if overlap not in (SKIP, QUEUE):
+        return False, _("Overlap must be '{skip}' or '{queue}'").format(skip=SKIP, queue=QUEUE)
+    return True, ""
+
+
+class _Entry:
+    """A schedule together with its run state."""
+
+    def __init__(self, schedule, now):
+        self.schedule = schedule
+        self.job = None
+        self.queued = False
+        last_run = schedule["last_run"]
+        due = last_run + schedule["interval"] if last_run else now
+        self.next_run = max(due, now) + random.uniform(0, schedule["jitter"])
+
+    def busy(self):
+        return self.job is not None and self.job.state == RUNNING
+
+    def same_settings(self, schedule):
+        return all(self.schedule[field] == schedule[field] for field in schedule if field != "last_run")
+
+
+class Scheduler:
+    """Run the saved schedules through a ScanService.
+
+    A schedule scans its range every `interval` seconds plus a random delay
+    of up to `jitter` seconds, so schedules set up together don't keep
+    firing at the same moment. Every run has its own scanner, so only a
+    schedule's own previous run can overlap with it: that run is skipped,
+    or with overlap "queue", started once the running scan ends (at most
+    one run is kept waiting). Finished scans are recorded by the service.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self._entries = {}
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._reload_at = 0
+        self._thread = None
+        service.connect_finished(self._on_job_finished)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    def reload(self):
+        """Pick up changes to the saved schedules now."""
+        with self._cond:
+            self._reload_at = 0
+            self._cond.notify_all()
+
+    def schedules(self):
+        """Return the active schedules with their next run and current job."""
+        with self._cond:
+            return [dict(entry.schedule,
+                         next_run=entry.next_run,
+                         queued=entry.queued,
+                         job=entry.job.id if entry.busy() else None)
+                    for entry in self._entries.values()]
+
+    def _on_job_finished(self, job):
+        with self._cond:
+            if any(entry.queued and entry.job is job for entry in self._entries.values()):
+                self._cond.notify_all()
+
+    def _reload(self, now):
+        entries = {}
+        for schedule in storage.load_schedules():
+            if not schedule["enabled"]:
+                continue
+            entry = self._entries.get(schedule["name"])
+            if entry is None or not entry.same_settings(schedule):
+                previous = entry
+                entry = _Entry(schedule, now)
+                if previous is not None:
+                    entry.job = previous.job
+            entries[schedule["name"]] = entry
+        self._entries = entries
+        self._reload_at = now + RELOAD_INTERVAL
+
+    def _launch(self, entry, now):
+        schedule = entry.schedule
+        entry.queued = False
+        try:
+            entry.job, _shared = self.service.start(schedule["ip_range"], schedule["deep_scan"],
+                                                    schedule["ports"])
+        except ValueError as e:
+            print(_("Schedule {name} could not start: {e}").format(name=schedule["name"], e=e))
+            return
+        schedule["last_run"] = now
+        storage.mark_schedule_run(schedule["name"], now)
+
+    def _run(self):
+        with self._cond:
+            while not self._stopping:
+                now = time.time()
+                if now >= self._reload_at:
+                    self._reload(now)
+
+                for entry in self._entries.values():
+                    if entry.queued and not entry.busy():
+                        self._launch(entry, now)
+                    elif now >= entry.next_run:
+                        schedule = entry.schedule
+                        entry.next_run = now + schedule["interval"] + random.uniform(0, schedule["jitter"])
+                        if not entry.busy():
+                            self._launch(entry, now)
+                        elif schedule["overlap"] == QUEUE:
+                            entry.queued = True
+                        else:
+                            print(_("Schedule {name} skipped: the previous scan is still running").format(
+                                name=schedule["name"]))
+
+                wake = min([entry.next_run for entry in self._entries.values()] + [self._reload_at])
+                self._cond.wait(max(0, wake - time.time()))
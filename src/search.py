@@ -0,0 +1,160 @@
+# search.py
+#
+# Copyright 2026 ZingyTomato
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import re
+
+# Kinds of term
+TEXT = "text"
+PORT = "port"
+SERVICE = "service"
+IS = "is"
+HOST = "host"
+VENDOR = "vendor"
+HAS = "has"
+
+# Kinds whose value only has to be contained in a field, or only has to
+# start it: a value containing (or extending) the previous one can only
+# match fewer devices.
+_SUBSTRING_KINDS = (TEXT, HOST)
+_PREFIX_KINDS = (SERVICE, VENDOR)
+
+_HEX = re.compile(r"[^0-9a-f]")
+
+
+class SearchKeys:
+    """The parts of a device a query is matched against, lowercased and
+    indexed once per device instead of on every keystroke."""
+
+    __slots__ = ("text", "hostname", "mac", "ports", "services", "has_os")
+
+    def __init__(self, ip, hostname, mac, ports, services, service_labels, os_display):
+        hostname = hostname.lower() if hostname != ip else ""
+        self.hostname = hostname
+        self.mac = _HEX.sub("", mac.lower())
+        self.ports = frozenset(ports)
+        self.services = tuple(service.lower() for service in services) + tuple(
+            label.lower() for label in service_labels)
+        self.has_os = bool(os_display)
+        self.text = "\n".join((ip, hostname, mac.lower(), *self.services, os_display.lower()))
+
+
+class Term:
+    """One filter of a query; value is already lowercased (or a set of ports)."""
+
+    def __init__(self, kind, value, negated=False):
+        self.kind = kind
+        self.value = value
+        self.negated = negated
+
+    def matches(self, keys, custom_name, known):
+        kind, value = self.kind, self.value
+        if kind == TEXT:
+            found = value in keys.text or value in custom_name
+        elif kind == PORT:
+            found = not keys.ports.isdisjoint(value)
+        elif kind == SERVICE:
+            found = any(service.startswith(value) for service in keys.services)
+        elif kind == IS:
+            found = known if value == "known" else not known
+        elif kind == HOST:
+            found = value in keys.hostname or value in custom_name
+        elif kind == VENDOR:
+            found = keys.mac.startswith(value)
+        elif value == "os":
+            found = keys.has_os
+        elif value == "services":
+            found = bool(keys.services)
+        else:
+            found = bool(custom_name)
+        return found != self.negated
+
+    def narrows(self, other):
+        """Whether this term can only match devices `other` matches."""
+        if (self.kind, self.negated) != (other.kind, other.negated):
+            return False
+        if self.value == other.value:
+            return True
+        if self.negated:
+            return False
+        if self.kind in _SUBSTRING_KINDS:
+            return other.value in self.value
+        if self.kind in _PREFIX_KINDS:
+            return self.value.startswith(other.value)
+        return False
+
+
+def _parse_term(token):
+    negated = token.startswith("-") and len(token) > 1
+    if negated:
+        token = token[1:]
+    kind, sep, value = token.partition(":")
+    kind = kind.lower()
+    value = value.lower()
+    if sep and value:
+        if kind == PORT:
+            ports = frozenset(int(port) for port in value.split(",") if port.isdigit())
+            if ports:
+                return Term(PORT, ports, negated)
+        elif kind == SERVICE:
+            return Term(SERVICE, value, negated)
+        elif kind == IS and value in ("new", "known"):
+            return Term(IS, value, negated)
+        elif kind == HOST:
+            return Term(HOST, value, negated)
+        elif kind == VENDOR:
+            prefix = _HEX.sub("", value)
+            if prefix:
+                return Term(VENDOR, prefix, negated)
+        elif kind == HAS and value in ("os", "services", "name"):
+            return Term(HAS, value, negated)
+    return Term(TEXT, token.lower(), negated)
+
+
+class Query:
+    """A parsed search: space-separated terms, all of which must match.
+
+        192.168.1        free text: IP, hostname, name, MAC, services or OS
+        port:22,80       has any of these ports open
+        service:plex     runs a service (by id or label prefix)
+        is:new, is:known whether the device was seen before this scan
+        host:nas         hostname or custom name contains this
+        vendor:b827eb    MAC address starts with this OUI prefix
+        has:os           has OS details (also has:services, has:name)
+
+    A leading '-' negates a term, e.g. -port:22. Anything else, including
+    unknown filters, is matched as free text. An empty query matches
+    everything.
+    """
+
+    def __init__(self, text=""):
+        self.terms = [_parse_term(token) for token in text.split()]
+
+    def __bool__(self):
+        return bool(self.terms)
+
+    def matches(self, keys, custom_name, known):
+        custom_name = custom_name.lower()
+        return all(term.matches(keys, custom_name, known) for term in self.terms)
+
+    def narrows(self, other):
+        """Whether every device this query matches is also matched by
+        `other`, so only other's matches need to be checked again."""
+        if len(self.terms) < len(other.terms):
+            return False
+        return all(new.narrows(old) for new, old in zip(self.terms, other.terms))
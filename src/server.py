@@ -0,0 +1,398 @@
+# server.py
+#
+# Copyright 2026 ZingyTomato
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+import itertools
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .iprange import IPRangeSet
+from .netinfo import HostnameResolver
+from .scanner import NetworkScanner
+from . import storage
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Job states
+RUNNING = "running"
+FINISHED = "finished"
+STOPPED = "stopped"
+FAILED = "failed"
+
+# Seconds between keep-alive comments on an idle event stream.
+KEEPALIVE_INTERVAL = 15
+
+
+class ScanJob:
+    """One scan run by the service, with everything needed to follow it.
+
+    Each job has its own NetworkScanner, whose callbacks run directly on
+    the scanning threads; readers synchronise through a condition variable.
+    """
+
+    def __init__(self, job_id, ip_range, deep_scan, key, on_finished, ports=None, resolver=None):
+        self.id = job_id
+        self.ip_range = ip_range
+        self.deep_scan = deep_scan
+        self.ports = ports
+        self.key = key
+        self.state = RUNNING
+        self.devices = []
+        self.progress = None
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self.scanner = NetworkScanner(resolver=resolver)
+        self._on_finished = on_finished
+        self._events = []
+        self._progress_version = 0
+        self._cond = threading.Condition()
+
+    def start(self):
+        self.scanner.scan_network(self.ip_range, self._on_complete, self._on_error,
+                                  self._on_progress, deep_scan=self.deep_scan,
+                                  results_callback=self._on_results, ports=self.ports)
+
+    def stop(self):
+        """Stop the scan, keeping the devices found so far."""
+        if self.state == RUNNING:
+            self.scanner.stop_scan()
+            self._finish(STOPPED, self.scanner.get_partial_results())
+
+    def _on_results(self, batch):
+        with self._cond:
+            self.devices.extend(batch)
+            self._events.append(("devices", batch))
+            self._cond.notify_all()
+
+    def _on_progress(self, scanned, total, phase=None, rate=0.0, eta=None):
+        with self._cond:
+            self.progress = {"scanned": scanned, "total": total, "phase": phase,
+                             "rate": round(rate, 1), "eta": eta}
+            self._progress_version += 1
+            self._cond.notify_all()
+
+    def _on_complete(self, devices):
+        self._finish(FINISHED, devices)
+
+    def _on_error(self, message):
+        self._finish(FAILED, None, message)
+
+    def _finish(self, state, devices, error=None):
+        with self._cond:
+            if self.state != RUNNING:
+                return
+            self.state = state
+            if devices is not None:
+                self.devices = devices
+            self.error = error
+            self.finished = time.time()
+            self._events.append(("done", self.summary()))
+            self._cond.notify_all()
+        self._on_finished(self)
+
+    def summary(self, with_devices=False):
+        info = {
+            "id": self.id,
+            "range": self.ip_range,
+            "deep_scan": self.deep_scan,
+            "ports": self.ports,
+            "state": self.state,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": self.progress,
+            "device_count": len(self.devices),
+            "error": self.error,
+        }
+        if with_devices:
+            info["devices"] = list(self.devices)
+        return info
+
+    def follow(self):
+        """Yield (event, data) as the scan progresses, starting with any
+        devices already found, until the scan is done. Yields (None, None)
+        when nothing happened for KEEPALIVE_INTERVAL seconds."""
+        index = 0
+        progress_seen = -1
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: index < len(self._events) or progress_seen != self._progress_version,
+                    KEEPALIVE_INTERVAL)
+                events = self._events[index:]
+                index = len(self._events)
+                progress = None
+                if progress_seen != self._progress_version:
+                    progress_seen = self._progress_version
+                    progress = self.progress
+            if progress is not None:
+                yield "progress", progress
+            for event in events:
+                yield event
+                if event[0] == "done":
+                    return
+            if not events and progress is None:
+                yield None, None
+
+
+class ScanService:
+    """Start, share and keep track of scan jobs.
+
+    A request for a range that is already being scanned (the same set of
+    addresses, however it is spelled, and the same scan mode) joins the
+    running job instead of starting another one. Scans with a custom port
+    list are only shared with scans of the same ports. All jobs share one
+    hostname resolver, and with it its sockets and its cache, so names
+    found by one scan are reused by the next.
+    """
+
+    MAX_FINISHED = 32
+
+    def __init__(self, record=True):
+        self.record = record
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._ids = itertools.count(1)
+        self._listeners = []
+        self.resolver = HostnameResolver()
+
+    def connect_finished(self, callback):
+        """Call callback(job) on the scanning thread whenever a job ends."""
+        self._listeners.append(callback)
+
+    def start(self, ip_range, deep_scan=False, ports=None):
+        """Return (job, shared). Raises ValueError for an invalid range."""
+        ports = sorted(set(ports)) if ports else None
+        key = (tuple(IPRangeSet.parse(ip_range).intervals), bool(deep_scan),
+               tuple(ports) if ports else None)
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None:
+                return job, True
+            job = ScanJob(next(self._ids), ip_range, bool(deep_scan), key, self._finished, ports,
+                          self.resolver)
+            self._jobs[job.id] = job
+            self._active[key] = job
+            self._prune()
+        job.start()
+        return job, False
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stop_all(self):
+        for job in self.jobs():
+            job.stop()
+
+    def close(self):
+        """Stop every job and release the shared resolver."""
+        self.stop_all()
+        self.resolver.close()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.state != RUNNING]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED)]:
+            del self._jobs[job_id]
+
+    def _finished(self, job):
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+        if self.record and job.devices and job.state in (FINISHED, STOPPED):
+            storage.record_scan(job.ip_range, job.devices, deep_scan=job.deep_scan)
+        for callback in self._listeners:
+            callback(job)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON API over the ScanService in server.service.
+
+    POST   /scans                  {"range": ..., "deep_scan": false, "ports": null}
+                                   start or join a scan
+    GET    /scans                  list jobs
+    GET    /scans/<id>             one job, with its devices
+    DELETE /scans/<id>             stop a job
+    GET    /scans/<id>/events      server-sent events: progress, devices, done
+    GET    /devices                the device registry
+    GET    /history                saved scans (?offset=&limit=), newest first
+    GET    /history/<id>           one saved scan, with its devices
+    GET    /schedules              recurring scans, with their next run
+    """
+
+    server_version = "NetPeek"
+
+    ROUTES = (
+        ("POST", re.compile(r"/scans"), "start_scan"),
+        ("GET", re.compile(r"/scans"), "list_scans"),
+        ("GET", re.compile(r"/scans/(\d+)"), "get_scan"),
+        ("DELETE", re.compile(r"/scans/(\d+)"), "stop_scan"),
+        ("GET", re.compile(r"/scans/(\d+)/events"), "scan_events"),
+        ("GET", re.compile(r"/devices"), "list_devices"),
+        ("GET", re.compile(r"/history"), "list_history"),
+        ("GET", re.compile(r"/history/(\d+)"), "get_history"),
+        ("GET", re.compile(r"/schedules"), "list_schedules"),
+    )
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+    def _route(self, method):
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+        path = url.path.rstrip("/") or "/"
+        allowed = False
+        for route_method, pattern, handler in self.ROUTES:
+            match = pattern.fullmatch(path)
+            if match:
+                allowed = True
+                if route_method == method:
+                    getattr(self, handler)(*(int(group) for group in match.groups()))
+                    return
+        if allowed:
+            self._send_json(405, {"error": "Method not allowed"})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length))
+        if not isinstance(body, dict):
+            raise ValueError("Expected a JSON object")
+        return body
+
+    def _job_or_404(self, job_id):
+        job = self.service.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": "No such scan"})
+        return job
+
+    def _query_int(self, name, default):
+        try:
+            return max(0, int(self.query.get(name, [default])[0]))
+        except ValueError:
+            return default
+
+    def start_scan(self):
+        try:
+            body = self._read_json()
+            ip_range = body.get("range", "")
+            if not isinstance(ip_range, str) or not ip_range.strip():
+                raise ValueError("Missing range")
+            ports = body.get("ports")
+            if ports is not None and not (isinstance(ports, list) and all(
+                    isinstance(port, int) and 1 <= port <= 65535 for port in ports)):
+                raise ValueError("Ports must be a list of numbers from 1 to 65535")
+            job, shared = self.service.start(ip_range, bool(body.get("deep_scan", False)), ports)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        info = job.summary()
+        info["shared"] = shared
+        self._send_json(200 if shared else 202, info)
+
+    def list_scans(self):
+        self._send_json(200, [job.summary() for job in self.service.jobs()])
+
+    def get_scan(self, job_id):
+        job = self._job_or_404(job_id)
+        if job is not None:
+            self._send_json(200, job.summary(with_devices=True))
+
+    def stop_scan(self, job_id):
+        job = self._job_or_404(job_id)
+        if job is not None:
+            job.stop()
+            self._send_json(200, job.summary())
+
+    def scan_events(self, job_id):
+        job = self._job_or_404(job_id)
+        if job is None:
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for event, data in job.follow():
+                if event is None:
+                    self.wfile.write(b": keep-alive\n\n")
+                else:
+                    self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def list_devices(self):
+        self._send_json(200, storage.load_devices())
+
+    def list_history(self):
+        offset = self._query_int("offset", 0)
+        limit = min(self._query_int("limit", 100), 1000)
+        self._send_json(200, storage.load_scan_summaries(offset, limit))
+
+    def get_history(self, scan_id):
+        scan = storage.load_scan(scan_id)
+        if scan is None:
+            self._send_json(404, {"error": "No such scan"})
+        else:
+            self._send_json(200, scan)
+
+    def list_schedules(self):
+        scheduler = self.server.scheduler
+        self._send_json(200, scheduler.schedules() if scheduler else storage.load_schedules())
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None, scheduler=None):
+    """Create (but don't start) the API server around a ScanService."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.service = service or ScanService()
+    server.scheduler = scheduler
+    return server
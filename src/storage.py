@@ -17,17 +17,133 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 
+import hashlib
+import ipaddress
 import json
 import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
 from datetime import datetime, timezone
 
-from gi.repository import GLib
+# A background compaction runs once at least this many scans are waiting
+# to be purged (tombstoned) or deduplicated (not yet packed).
+COMPACT_THRESHOLD = 16
+
+# Packed scans are stored as a delta against the previous scan of the same
+# range; every this many scans in a chain a full keyframe is stored instead.
+KEYFRAME_INTERVAL = 16
+
+# StorageWriter commits renames made within this many seconds together.
+RENAME_DELAY = 0.5
+
+# How the devices column of a scan is encoded.
+_INLINE = 0    # list of device dicts, as recorded
+_KEYFRAME = 1  # list of [key, record hash] pairs
+_DELTA = 2     # {"set": [[key, record hash], ...], "drop": [key, ...]} against base
+
+_DAY = 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    created REAL NOT NULL,
+    ip_range TEXT NOT NULL,
+    deep_scan INTEGER NOT NULL DEFAULT 0,
+    device_count INTEGER NOT NULL DEFAULT 0,
+    devices TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+-- Covers the history list, so paging through summaries never reads the
+-- device payloads.
+CREATE INDEX IF NOT EXISTS scans_summary
+    ON scans(deleted, created, id, timestamp, ip_range, device_count, deep_scan);
+CREATE TABLE IF NOT EXISTS devices (
+    key TEXT PRIMARY KEY,
+    mac TEXT NOT NULL DEFAULT '',
+    first_seen TEXT NOT NULL DEFAULT '',
+    last_seen TEXT NOT NULL DEFAULT '',
+    last_ip TEXT NOT NULL DEFAULT '',
+    last_hostname TEXT NOT NULL DEFAULT '',
+    custom_name TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS devices_last_ip ON devices(last_ip);
+CREATE INDEX IF NOT EXISTS devices_last_seen ON devices(last_seen);
+-- Settings every process using the database has to agree on, such as the
+-- retention policy the app's preferences set and the daemon compacts by.
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+_DEVICE_FIELDS = ("mac", "first_seen", "last_seen", "last_ip", "last_hostname", "custom_name")
+
+# Stay well below SQLite's limit on bound parameters per statement.
+_MAX_PARAMS = 500
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_compact_lock = threading.Lock()
+
+
+class RetentionPolicy:
+    """Decides which saved scans to keep as they age.
+
+    Every scan younger than keep_all_days is kept. After that only the
+    newest scan of each range per hour is kept until hourly_days, then the
+    newest per day until daily_days (0 keeps daily scans forever). With
+    max_bytes set, the oldest scans are dropped until history fits.
+    """
 
-MAX_SCAN_HISTORY = 50
+    def __init__(self, keep_all_days=7, hourly_days=30, daily_days=0, max_bytes=0):
+        self.keep_all_days = keep_all_days
+        self.hourly_days = hourly_days
+        self.daily_days = daily_days
+        self.max_bytes = max_bytes
+
+    def to_dict(self):
+        return {
+            "keep_all_days": self.keep_all_days,
+            "hourly_days": self.hourly_days,
+            "daily_days": self.daily_days,
+            "max_bytes": self.max_bytes,
+        }
+
+    def expired(self, scans, now):
+        """Return the ids of scans to drop, given (id, created, ip_range)
+        tuples ordered newest first."""
+        keep_all = now - self.keep_all_days * _DAY
+        hourly = now - self.hourly_days * _DAY
+        daily = now - self.daily_days * _DAY if self.daily_days else None
+        kept_buckets = set()
+        expired = []
+        for scan_id, created, ip_range in scans:
+            if created >= keep_all:
+                continue
+            if created >= hourly:
+                bucket = ("hour", ip_range, int(created // 3600))
+            elif daily is None or created >= daily:
+                bucket = ("day", ip_range, time.localtime(created)[:3])
+            else:
+                expired.append(scan_id)
+                continue
+            if bucket in kept_buckets:
+                expired.append(scan_id)
+            else:
+                kept_buckets.add(bucket)
+        return expired
 
 
 def _data_dir():
-    path = os.path.join(GLib.get_user_data_dir(), "netpeek")
+    # $XDG_DATA_HOME, falling back to the spec's default when unset or
+    # relative. Inside the Flatpak sandbox this points into the app's data.
+    base = os.environ.get("XDG_DATA_HOME", "")
+    if not os.path.isabs(base):
+        base = os.path.join(os.path.expanduser("~"), ".local", "share")
+    path = os.path.join(base, "netpeek")
     os.makedirs(path, exist_ok=True)
     return path
 
@@ -40,6 +156,226 @@ def _scans_path():
     return os.path.join(_data_dir(), "scans.json")
 
 
+def _db_path():
+    return os.path.join(_data_dir(), "netpeek.db")
+
+
+def _connect():
+    """Return this thread's connection to the database.
+
+    The database runs in WAL mode, so readers (the history dialog) never
+    block the writer recording a scan and vice versa.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(_db_path(), timeout=10)
+        conn.row_factory = sqlite3.Row
+        # auto_vacuum only takes effect if set before the first table exists.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        with _init_lock:
+            with conn:
+                conn.executescript(_SCHEMA)
+                _migrate_schema(conn)
+                imported = [_migrate_json_scans(conn), _migrate_json_devices(conn)]
+            # Old files are only retired once their import has committed,
+            # so a failed import is retried on the next start.
+            for path in filter(None, imported):
+                os.replace(path, path + ".migrated")
+        _local.conn = conn
+    return conn
+
+
+# Each entry upgrades the database by one version (PRAGMA user_version).
+_MIGRATIONS = (
+    # Packed scans store record hashes instead of device dicts; identical
+    # device records are shared between scans. A packed scan is either a
+    # keyframe or a delta against its base, `depth` deltas from a keyframe.
+    """
+    ALTER TABLE scans ADD COLUMN packed INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE scans ADD COLUMN base INTEGER;
+    ALTER TABLE scans ADD COLUMN depth INTEGER NOT NULL DEFAULT 0;
+    CREATE INDEX scans_pending ON scans(id) WHERE deleted = 1 OR packed = 0;
+    CREATE INDEX scans_range ON scans(ip_range, id);
+    CREATE INDEX scans_base ON scans(base) WHERE base IS NOT NULL;
+    CREATE TABLE records (
+        hash TEXT PRIMARY KEY,
+        data TEXT NOT NULL,
+        refs INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    """,
+    # Recurring scans run by the daemon; ports is a JSON list, or NULL for
+    # the scanner's default ports.
+    """
+    CREATE TABLE schedules (
+        name TEXT PRIMARY KEY,
+        ip_range TEXT NOT NULL,
+        ports TEXT,
+        deep_scan INTEGER NOT NULL DEFAULT 0,
+        interval INTEGER NOT NULL,
+        jitter INTEGER NOT NULL DEFAULT 0,
+        overlap TEXT NOT NULL DEFAULT 'skip',
+        enabled INTEGER NOT NULL DEFAULT 1,
+        last_run REAL
+    ) WITHOUT ROWID;
+    """,
+)
+
+
+def _migrate_schema(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, script in enumerate(_MIGRATIONS[version:], start=version + 1):
+        conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;")
+
+
+def _migrate_json_scans(conn):
+    """One-time import of the old monolithic scans.json.
+
+    Returns the path imported, to be renamed once the import is committed.
+    """
+    path = _scans_path()
+    if not os.path.exists(path):
+        return None
+    # Stored newest first; insert oldest first so ids follow time order.
+    for scan in reversed(_load_json(path, [])):
+        _insert_scan(conn, scan.get("timestamp", ""), scan.get("ip_range", ""),
+                     scan.get("devices", []), scan.get("deep_scan", False))
+    return path
+
+
+def _migrate_json_devices(conn):
+    """One-time import of the old devices.json registry, like _migrate_json_scans."""
+    path = _devices_path()
+    if not os.path.exists(path):
+        return None
+    registry = _load_json(path, {})
+    conn.executemany(
+        "INSERT OR IGNORE INTO devices (key, mac, first_seen, last_seen, last_ip,"
+        " last_hostname, custom_name) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(key, *(record.get(field, "") or "" for field in _DEVICE_FIELDS))
+         for key, record in registry.items()])
+    return path
+
+
+def _timestamp_to_epoch(timestamp):
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _insert_scan(conn, timestamp, ip_range, devices, deep_scan):
+    cursor = conn.execute(
+        "INSERT INTO scans (timestamp, created, ip_range, deep_scan, device_count, devices)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        (timestamp, _timestamp_to_epoch(timestamp), ip_range, int(bool(deep_scan)),
+         len(devices), json.dumps(devices, separators=(",", ":"))))
+    return cursor.lastrowid
+
+
+def _chunks(items):
+    for i in range(0, len(items), _MAX_PARAMS):
+        yield items[i:i + _MAX_PARAMS]
+
+
+def _record_hash(data):
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _encode_record(device):
+    return json.dumps(device, sort_keys=True, separators=(",", ":"))
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(",", ":"))
+
+
+def _unique_keys(devices):
+    """Registry keys for the devices of one scan, made unique within it."""
+    keys = []
+    seen = Counter()
+    for device in devices:
+        key = device_key(device.get("mac", ""), device.get("ip", ""))
+        seen[key] += 1
+        keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return keys
+
+
+def _load_records(conn, hashes):
+    records = {}
+    for chunk in _chunks(list(set(hashes))):
+        placeholders = ",".join("?" * len(chunk))
+        for record in conn.execute(
+                f"SELECT hash, data FROM records WHERE hash IN ({placeholders})", chunk):
+            records[record["hash"]] = record["data"]
+    return records
+
+
+def _payload_hashes(packed, payload):
+    """Record hashes referenced by a packed scan's own payload."""
+    if packed == _KEYFRAME:
+        return [digest for _key, digest in payload]
+    if packed == _DELTA:
+        return [digest for _key, digest in payload["set"]]
+    return []
+
+
+def _scan_entries(conn, row, cache=None):
+    """Reconstruct a packed scan as an ordered {key: record hash} map by
+    replaying the deltas on top of the nearest keyframe."""
+    deltas = []
+    entries = None
+    while row is not None:
+        if cache is not None and row["id"] in cache:
+            entries = dict(cache[row["id"]])
+            break
+        if row["packed"] != _DELTA:
+            entries = dict(json.loads(row["devices"]))
+            break
+        deltas.append(json.loads(row["devices"]))
+        row = conn.execute(
+            "SELECT id, packed, devices, base FROM scans WHERE id = ?", (row["base"],)).fetchone()
+    if entries is None:
+        entries = {}
+    for delta in reversed(deltas):
+        for key in delta["drop"]:
+            entries.pop(key, None)
+        entries.update(delta["set"])
+    return entries
+
+
+def _scan_devices(conn, row, cache=None):
+    if row["packed"] == _INLINE:
+        return json.loads(row["devices"])
+    entries = _scan_entries(conn, row, cache)
+    if cache is not None:
+        cache[row["id"]] = entries
+    records = _load_records(conn, entries.values())
+    devices = [json.loads(records[digest]) for digest in entries.values() if digest in records]
+    # Replaying a delta appends new devices at the end; restore the IP
+    # order scans are recorded in (see NetworkScanner.scan_network).
+    devices.sort(key=_ip_order)
+    return devices
+
+
+def _ip_order(device):
+    try:
+        return 0, int(ipaddress.IPv4Address(device.get("ip", "")))
+    except ValueError:
+        return 1, 0
+
+
+def _scan_from_row(conn, row, cache=None):
+    return {
+        "id": row["id"],
+        "timestamp": row["timestamp"],
+        "ip_range": row["ip_range"],
+        "devices": _scan_devices(conn, row, cache),
+        "deep_scan": bool(row["deep_scan"]),
+    }
+
+
 def _load_json(path, default):
     try:
         with open(path, "r", encoding="utf-8") as f:
@@ -48,13 +384,6 @@ def _load_json(path, default):
         return default
 
 
-def _save_json(path, data):
-    tmp_path = path + ".tmp"
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
-    os.replace(tmp_path, path)
-
-
 def _now():
     return datetime.now(timezone.utc).isoformat()
 
@@ -65,93 +394,557 @@ def device_key(mac, ip):
 
 def load_devices():
     """Return the device registry as {key: device_record}."""
-    return _load_json(_devices_path(), {})
+    rows = _connect().execute("SELECT * FROM devices")
+    return {row["key"]: {field: row[field] for field in _DEVICE_FIELDS} for row in rows}
 
 
-def save_devices(devices):
-    _save_json(_devices_path(), devices)
+def _lookup_devices(keys):
+    """Return {key: row} for the given registry keys that exist."""
+    conn = _connect()
+    found = {}
+    for chunk in _chunks(list(dict.fromkeys(keys))):
+        placeholders = ",".join("?" * len(chunk))
+        for row in conn.execute(
+                f"SELECT * FROM devices WHERE key IN ({placeholders})", chunk):
+            found[row["key"]] = row
+    return found
 
 
-def load_scans():
-    """Return saved scans, newest first."""
-    return _load_json(_scans_path(), [])
+def _keys_for(devices):
+    return [device_key(device.get("mac", ""), device.get("ip", "")) for device in devices]
 
 
-def save_scans(scans):
-    _save_json(_scans_path(), scans)
+def load_scans():
+    """Return saved scans, newest first."""
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT * FROM scans WHERE deleted = 0 ORDER BY created ASC, id ASC").fetchall()
+    # Oldest first, so each delta finds its base already reconstructed.
+    cache = {}
+    scans = [_scan_from_row(conn, row, cache) for row in rows]
+    scans.reverse()
+    return scans
+
+
+def count_scans_by_day():
+    """Return [(local_date, count)] for saved scans, newest day first."""
+    rows = _connect().execute(
+        "SELECT date(created, 'unixepoch', 'localtime') AS day, COUNT(*) FROM scans"
+        " WHERE deleted = 0 GROUP BY day ORDER BY day DESC")
+    return [(row[0], row[1]) for row in rows]
+
+
+def load_scan_summaries(offset, limit):
+    """Return up to `limit` scans from `offset` (newest first) without
+    their device lists."""
+    rows = _connect().execute(
+        "SELECT id, timestamp, ip_range, device_count, deep_scan FROM scans"
+        " WHERE deleted = 0 ORDER BY created DESC, id DESC LIMIT ? OFFSET ?",
+        (limit, offset))
+    return [{
+        "id": row["id"],
+        "timestamp": row["timestamp"],
+        "ip_range": row["ip_range"],
+        "device_count": row["device_count"],
+        "deep_scan": bool(row["deep_scan"]),
+    } for row in rows]
+
+
+def load_scan(scan_id):
+    """Return a single saved scan with its devices, or None."""
+    conn = _connect()
+    row = conn.execute(
+        "SELECT * FROM scans WHERE id = ? AND deleted = 0", (scan_id,)).fetchone()
+    return _scan_from_row(conn, row) if row else None
+
+
+def load_previous_scan(ip_range, before_id=None):
+    """Return the latest saved scan of ip_range (older than before_id, if
+    given) with its devices, or None."""
+    conn = _connect()
+    row = conn.execute(
+        "SELECT * FROM scans WHERE ip_range = ? AND id < ? AND deleted = 0"
+        " ORDER BY id DESC LIMIT 1",
+        (ip_range, before_id if before_id is not None else 2 ** 63 - 1)).fetchone()
+    return _scan_from_row(conn, row) if row else None
+
+
+def _previous_scan(ip_range, before_id=None):
+    """load_previous_scan() with the custom names of its devices refreshed."""
+    previous = load_previous_scan(ip_range, before_id)
+    if previous is not None:
+        previous["devices"] = apply_custom_names(previous["devices"])
+    return previous
 
 
 def get_custom_name(key):
-    devices = load_devices()
-    record = devices.get(key)
-    return record.get("custom_name", "") if record else ""
+    row = _connect().execute(
+        "SELECT custom_name FROM devices WHERE key = ?", (key,)).fetchone()
+    return row["custom_name"] if row else ""
 
 
 def set_custom_name(key, name):
-    devices = load_devices()
-    record = devices.setdefault(key, {})
-    record["custom_name"] = name
-    save_devices(devices)
+    set_custom_names({key: name})
+
+
+def set_custom_names(names):
+    """Save several {key: custom name} renames in one transaction."""
+    conn = _connect()
+    with conn:
+        conn.executemany(
+            "INSERT INTO devices (key, custom_name) VALUES (?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET custom_name = excluded.custom_name",
+            names.items())
 
 
 def apply_custom_names(devices):
     """Return copies of the given device dicts with custom_name refreshed
     from the live registry, so renames show up in older scans too."""
-    registry = load_devices()
+    keys = _keys_for(devices)
+    registry = _lookup_devices(keys)
     refreshed = []
-    for device in devices:
-        record = registry.get(device_key(device.get("mac", ""), device.get("ip", "")))
+    for key, device in zip(keys, devices):
+        record = registry.get(key)
         merged = dict(device)
         if record is not None:
-            merged["custom_name"] = record.get("custom_name", "")
+            merged["custom_name"] = record["custom_name"]
         refreshed.append(merged)
     return refreshed
 
 
+def annotate_devices(devices):
+    """Return copies of freshly scanned device dicts with `custom_name` and
+    `known` filled in from the registry, without recording anything."""
+    keys = _keys_for(devices)
+    registry = _lookup_devices(keys)
+    annotated = []
+    for key, device in zip(keys, devices):
+        record = registry.get(key)
+        enriched = dict(device)
+        enriched["custom_name"] = record["custom_name"] if record else ""
+        enriched["known"] = record is not None
+        annotated.append(enriched)
+    return annotated
+
+
 def record_scan(ip_range, devices, deep_scan=False):
     """Persist a completed scan and update the device registry.
 
     Annotates and returns the given device list with `custom_name` and
     `known` (whether this device was already in the registry before now).
     """
-    registry = load_devices()
     now = _now()
+    keys = _keys_for(devices)
+    registry = _lookup_devices(keys)
     annotated = []
+    upserts = []
 
-    for device in devices:
-        key = device_key(device.get("mac", ""), device.get("ip", ""))
+    for key, device in zip(keys, devices):
         existing = registry.get(key)
-        known = existing is not None
-
-        record = existing or {"first_seen": now}
-        record["last_seen"] = now
-        record["last_ip"] = device.get("ip", "")
-        record["last_hostname"] = device.get("hostname", "")
-        record["mac"] = device.get("mac", "") or record.get("mac", "")
-        record.setdefault("custom_name", "")
-        registry[key] = record
-
         enriched = dict(device)
-        enriched["custom_name"] = record["custom_name"]
-        enriched["known"] = known
+        enriched["custom_name"] = existing["custom_name"] if existing else ""
+        enriched["known"] = existing is not None
         annotated.append(enriched)
+        upserts.append((key, device.get("mac", ""), now, now,
+                        device.get("ip", ""), device.get("hostname", "")))
+
+    conn = _connect()
+    with conn:
+        # first_seen and custom_name are only set for new devices, and an
+        # empty MAC never overwrites a previously seen one.
+        conn.executemany(
+            "INSERT INTO devices (key, mac, first_seen, last_seen, last_ip, last_hostname)"
+            " VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET"
+            " last_seen = excluded.last_seen, last_ip = excluded.last_ip,"
+            " last_hostname = excluded.last_hostname,"
+            " mac = CASE WHEN excluded.mac != '' THEN excluded.mac ELSE devices.mac END",
+            upserts)
+        # Stored as-is for now; a background compaction applies the
+        # retention policy and deduplicates the device records later.
+        _insert_scan(conn, now, ip_range, annotated, deep_scan)
+    _maybe_compact()
 
-    save_devices(registry)
+    return annotated
 
-    scans = load_scans()
-    scans.insert(0, {
-        "timestamp": now,
-        "ip_range": ip_range,
-        "devices": annotated,
-        "deep_scan": deep_scan,
-    })
-    save_scans(scans[:MAX_SCAN_HISTORY])
 
-    return annotated
+def delete_scan(scan_id):
+    """Remove a single scan history entry by its id."""
+    conn = _connect()
+    with conn:
+        conn.execute("UPDATE scans SET deleted = 1 WHERE id = ?", (scan_id,))
+    _maybe_compact()
+
+
+def _schedule_from_row(row):
+    return {
+        "name": row["name"],
+        "ip_range": row["ip_range"],
+        "ports": json.loads(row["ports"]) if row["ports"] else None,
+        "deep_scan": bool(row["deep_scan"]),
+        "interval": row["interval"],
+        "jitter": row["jitter"],
+        "overlap": row["overlap"],
+        "enabled": bool(row["enabled"]),
+        "last_run": row["last_run"],
+    }
+
+
+def load_schedules():
+    """Return every saved schedule, ordered by name."""
+    rows = _connect().execute("SELECT * FROM schedules ORDER BY name")
+    return [_schedule_from_row(row) for row in rows]
+
+
+def save_schedule(name, ip_range, interval, ports=None, deep_scan=False, jitter=0,
+                  overlap="skip", enabled=True):
+    """Create or replace a schedule, keeping when it last ran."""
+    conn = _connect()
+    with conn:
+        conn.execute(
+            "INSERT INTO schedules (name, ip_range, ports, deep_scan, interval, jitter, overlap, enabled)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(name) DO UPDATE SET"
+            " ip_range = excluded.ip_range, ports = excluded.ports,"
+            " deep_scan = excluded.deep_scan, interval = excluded.interval,"
+            " jitter = excluded.jitter, overlap = excluded.overlap, enabled = excluded.enabled",
+            (name, ip_range, _dumps(list(ports)) if ports else None, int(deep_scan),
+             interval, jitter, overlap, int(enabled)))
+
+
+def delete_schedule(name):
+    """Remove a schedule. Returns whether it existed."""
+    conn = _connect()
+    with conn:
+        cursor = conn.execute("DELETE FROM schedules WHERE name = ?", (name,))
+    return cursor.rowcount > 0
+
+
+def mark_schedule_run(name, when):
+    """Remember when a schedule last started a scan."""
+    conn = _connect()
+    with conn:
+        conn.execute("UPDATE schedules SET last_run = ? WHERE name = ?", (when, name))
+
+
+def set_retention_policy(policy):
+    """Save the retention policy for every process using the history (the
+    app, the daemon and recording CLI runs) and apply it in the background.
+
+    Nothing is written or compacted if the saved policy is the same.
+    """
+    conn = _connect()
+    if _load_retention_policy(conn).to_dict() == policy.to_dict():
+        return
+    with conn:
+        conn.execute(
+            "INSERT INTO settings (key, value) VALUES ('retention', ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (_dumps(policy.to_dict()),))
+    _maybe_compact(force=True)
+
+
+def _maybe_compact(force=False):
+    if not force:
+        pending = _connect().execute(
+            "SELECT COUNT(*) FROM scans WHERE deleted = 1 OR packed = 0").fetchone()[0]
+        if pending < COMPACT_THRESHOLD:
+            return
+    if _compact_lock.acquire(blocking=False):
+        threading.Thread(target=_compact, daemon=True).start()
+
+
+def _tombstone(conn, scan_ids):
+    for chunk in _chunks(list(scan_ids)):
+        placeholders = ",".join("?" * len(chunk))
+        conn.execute(f"UPDATE scans SET deleted = 1 WHERE id IN ({placeholders})", chunk)
+
+
+def _encode_scan(conn, entries, base, cache=None):
+    """Encode a {key: record hash} map as a delta against base (a packed
+    scan row) or, when that doesn't pay off, as a keyframe.
+
+    Returns (packed, payload, base_id, depth).
+    """
+    if base is not None and base["depth"] + 1 < KEYFRAME_INTERVAL:
+        base_entries = _scan_entries(conn, base, cache)
+        changed = [[key, digest] for key, digest in entries.items()
+                   if base_entries.get(key) != digest]
+        dropped = [key for key in base_entries if key not in entries]
+        if len(changed) + len(dropped) < len(entries):
+            return _DELTA, {"set": changed, "drop": dropped}, base["id"], base["depth"] + 1
+    return _KEYFRAME, [[key, digest] for key, digest in entries.items()], None, 0
+
+
+def _write_encoded(conn, scan_id, encoded, refs):
+    packed, payload, base_id, depth = encoded
+    conn.execute("UPDATE scans SET devices = ?, packed = ?, base = ?, depth = ? WHERE id = ?",
+                 (_dumps(payload), packed, base_id, depth, scan_id))
+    refs.update(_payload_hashes(packed, payload))
+
+
+def _apply_refs(conn, refs):
+    conn.executemany("UPDATE records SET refs = refs + ? WHERE hash = ?",
+                     [(count, digest) for digest, count in refs.items() if count])
 
 
-def delete_scan(timestamp):
-    """Remove a single scan history entry by its timestamp."""
-    scans = load_scans()
-    scans = [scan for scan in scans if scan.get("timestamp") != timestamp]
-    save_scans(scans)
+def _purge(conn):
+    """Delete tombstoned scans and any records no longer referenced.
+
+    Live scans stored as a delta against a tombstoned scan are first
+    re-encoded against their nearest live ancestor (or as a keyframe).
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    with conn:
+        refs = Counter()
+        orphans = conn.execute(
+            "SELECT scan.* FROM scans AS scan JOIN scans AS base ON scan.base = base.id"
+            " WHERE scan.deleted = 0 AND base.deleted = 1").fetchall()
+        # Reconstruct everything before rewriting anything, since orphans
+        # may sit on the same chain.
+        rebuilt = [(row, _scan_entries(conn, row)) for row in orphans]
+        for row, entries in rebuilt:
+            ancestor = conn.execute(
+                "SELECT * FROM scans WHERE id = ?", (row["base"],)).fetchone()
+            while ancestor is not None and ancestor["deleted"]:
+                ancestor = conn.execute(
+                    "SELECT * FROM scans WHERE id = ?", (ancestor["base"],)).fetchone()
+            refs.subtract(_payload_hashes(row["packed"], json.loads(row["devices"])))
+            _write_encoded(conn, row["id"], _encode_scan(conn, entries, ancestor), refs)
+
+        for row in conn.execute("SELECT packed, devices FROM scans WHERE deleted = 1 AND packed != ?",
+                                (_INLINE,)):
+            refs.subtract(_payload_hashes(row["packed"], json.loads(row["devices"])))
+        _apply_refs(conn, refs)
+        conn.execute("DELETE FROM scans WHERE deleted = 1")
+        conn.execute("DELETE FROM records WHERE refs <= 0")
+
+
+def _pack(conn, batch=64):
+    """Move device dicts out of unpacked scans into shared records, storing
+    each scan as a delta against the previous scan of the same range."""
+    cache = {}
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        with conn:
+            refs = Counter()
+            rows = conn.execute(
+                "SELECT id, ip_range, devices FROM scans WHERE packed = ? AND deleted = 0"
+                " ORDER BY id LIMIT ?", (_INLINE, batch)).fetchall()
+            for row in rows:
+                devices = json.loads(row["devices"])
+                encoded = [_encode_record(device) for device in devices]
+                hashes = [_record_hash(data) for data in encoded]
+                conn.executemany(
+                    "INSERT INTO records (hash, data, refs) VALUES (?, ?, 0)"
+                    " ON CONFLICT(hash) DO NOTHING", zip(hashes, encoded))
+                entries = dict(zip(_unique_keys(devices), hashes))
+                base = conn.execute(
+                    "SELECT * FROM scans WHERE ip_range = ? AND id < ? AND deleted = 0"
+                    " AND packed != ? ORDER BY id DESC LIMIT 1",
+                    (row["ip_range"], row["id"], _INLINE)).fetchone()
+                _write_encoded(conn, row["id"], _encode_scan(conn, entries, base, cache), refs)
+                cache[row["id"]] = entries
+            _apply_refs(conn, refs)
+        if len(rows) < batch:
+            return
+
+
+def _history_bytes(conn):
+    return conn.execute(
+        "SELECT (SELECT COALESCE(SUM(length(devices)), 0) FROM scans WHERE deleted = 0)"
+        " + (SELECT COALESCE(SUM(length(data)), 0) FROM records)").fetchone()[0]
+
+
+def _enforce_budget(conn, max_bytes):
+    """Drop the oldest scans until history fits, always keeping the newest."""
+    while _history_bytes(conn) > max_bytes:
+        live = conn.execute("SELECT COUNT(*) FROM scans WHERE deleted = 0").fetchone()[0]
+        if live <= 1:
+            return
+        oldest = conn.execute(
+            "SELECT id FROM scans WHERE deleted = 0 ORDER BY created, id LIMIT ?",
+            (min(live - 1, max(1, live // 20)),)).fetchall()
+        with conn:
+            _tombstone(conn, (row["id"] for row in oldest))
+        _purge(conn)
+
+
+def _load_retention_policy(conn):
+    """Return the saved retention policy, or the default one if the app
+    never set one (e.g. only the CLI has used this database)."""
+    row = conn.execute("SELECT value FROM settings WHERE key = 'retention'").fetchone()
+    if row is None:
+        return RetentionPolicy()
+    try:
+        saved = json.loads(row["value"])
+        return RetentionPolicy(**{field: value for field, value in saved.items()
+                                  if field in RetentionPolicy().to_dict()})
+    except (ValueError, TypeError, AttributeError):
+        return RetentionPolicy()
+
+
+def _compact():
+    """Apply the retention policy, deduplicate device records, purge
+    tombstoned scans and hand the freed pages back to the OS."""
+    try:
+        conn = _connect()
+        policy = _load_retention_policy(conn)
+        scans = conn.execute(
+            "SELECT id, created, ip_range FROM scans WHERE deleted = 0"
+            " ORDER BY created DESC, id DESC").fetchall()
+        expired = policy.expired(scans, time.time())
+        if expired:
+            with conn:
+                _tombstone(conn, expired)
+        _purge(conn)
+        _pack(conn)
+        if policy.max_bytes:
+            _enforce_budget(conn, policy.max_bytes)
+        # Through execute() only one page is freed per call; executescript
+        # steps the pragma to completion.
+        conn.executescript("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except sqlite3.Error as e:
+        print(_("History compaction failed: {e}").format(e=e))
+    finally:
+        _compact_lock.release()
+
+
+class StorageWriter:
+    """Run history writes on a background thread, in the order given.
+
+    Renames are coalesced: every rename made within RENAME_DELAY seconds of
+    the first pending one is saved in a single transaction, and a device
+    renamed twice is only written once. Pending renames are always saved
+    before any other queued work, so lookups made here see every rename.
+    Results are handed back through dispatch, e.g. GLib.idle_add to get
+    them on the main loop.
+    """
+
+    def __init__(self, dispatch=None):
+        self.dispatch = dispatch or (lambda callback, *args: callback(*args))
+        self._cond = threading.Condition()
+        self._renames = {}
+        self._rename_due = None
+        self._tasks = deque()
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def set_custom_name(self, key, name):
+        with self._cond:
+            self._renames[key] = name
+            if self._rename_due is None:
+                self._rename_due = time.monotonic() + RENAME_DELAY
+            self._cond.notify_all()
+
+    def annotate_devices(self, devices, callback):
+        """Call callback(annotated) with the devices annotated like
+        annotate_devices(), looked up off the caller's thread."""
+        def failed():
+            return ([dict(device, custom_name="", known=False) for device in devices],)
+
+        self._submit(lambda: (annotate_devices(devices),), failed, callback,
+                     _("Could not look up devices: {e}"))
+
+    def load_saved_scan(self, ip_range, devices, scan_id, callback):
+        """Call callback(previous, refreshed) for a scan loaded from history:
+        the scan of the range saved before it (or None) and its devices with
+        custom names refreshed like apply_custom_names()."""
+        def task():
+            previous = _previous_scan(ip_range, scan_id) if scan_id is not None else None
+            return previous, apply_custom_names(devices)
+
+        self._submit(task, lambda: (None, devices), callback,
+                     _("Could not load the scan: {e}"))
+
+    def record_scan(self, ip_range, devices, deep_scan=False, callback=None):
+        """Record a scan like record_scan(), then call
+        callback(previous, annotated) with the scan of the range saved
+        before this one (or None) and the annotated devices."""
+        def task():
+            previous = _previous_scan(ip_range)
+            return previous, record_scan(ip_range, devices, deep_scan)
+
+        def failed():
+            return None, [dict(device, custom_name="", known=False) for device in devices]
+
+        self._submit(task, failed, callback, _("Could not save the scan: {e}"))
+
+    def set_retention_policy(self, policy):
+        """Save the retention policy like set_retention_policy()."""
+        self._submit(lambda: set_retention_policy(policy), None, None,
+                     _("Could not save the history settings: {e}"))
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        with self._cond:
+            if self._rename_due is not None:
+                self._rename_due = 0
+                self._cond.notify_all()
+            self._cond.wait_for(
+                lambda: not (self._tasks or self._renames or self._busy) or self._closed)
+
+    def close(self):
+        """Write whatever is pending and stop the thread."""
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _submit(self, task, failed, callback, error):
+        with self._cond:
+            self._tasks.append((task, failed, callback, error))
+            self._cond.notify_all()
+
+    def _next_batch(self):
+        """Wait for work; return (renames, task), either of which may be empty."""
+        with self._cond:
+            while True:
+                self._busy = False
+                self._cond.notify_all()
+                if self._closed:
+                    return None, None
+                renames_due = self._renames and (self._tasks or time.monotonic() >= self._rename_due)
+                if renames_due or self._tasks:
+                    break
+                timeout = self._rename_due - time.monotonic() if self._renames else None
+                self._cond.wait(timeout)
+            self._busy = True
+            renames = {}
+            if renames_due:
+                renames, self._renames, self._rename_due = self._renames, {}, None
+            return renames, self._tasks.popleft() if self._tasks else None
+
+    def _run(self):
+        while True:
+            renames, task = self._next_batch()
+            if renames is None:
+                return
+            try:
+                self._write(renames, task)
+            finally:
+                # Whatever went wrong, flush() and close() must not wait
+                # on this batch forever.
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _write(self, renames, task):
+        # Any failure is reported and skipped, so one bad write can't stop
+        # the thread and leave later writes (or the app's exit) waiting.
+        if renames:
+            try:
+                set_custom_names(renames)
+            except Exception as e:
+                print(_("Could not save device names: {e}").format(e=e))
+        if task:
+            work, failed, callback, error = task
+            try:
+                result = work()
+            except Exception as e:
+                print(error.format(e=e))
+                result = failed() if failed else None
+            if callback:
+                self.dispatch(callback, *result)
@@ -23,7 +23,6 @@ gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
 from gi.repository import Gtk, Adw, Gdk, GObject, GLib
 
-from . import storage
 
 @Gtk.Template(resource_path='/io/github/zingytomato/netpeek/gtk/device_card.ui')
 class DeviceCard(Adw.Bin):
@@ -33,6 +32,7 @@ class DeviceCard(Adw.Bin):
     name_row = Gtk.Template.Child()
     name_apply_button = Gtk.Template.Child()
     new_badge = Gtk.Template.Child()
+    changes_row = Gtk.Template.Child()
     ip_row = Gtk.Template.Child()
     hostname_row = Gtk.Template.Child()
     ports_row = Gtk.Template.Child()
@@ -41,30 +41,56 @@ class DeviceCard(Adw.Bin):
     os_row = Gtk.Template.Child()
     os_expand_button = Gtk.Template.Child()
 
-    def __init__(self, device, toast_overlay):
+    def __init__(self, toast_overlay, storage_writer):
         super().__init__()
-        self.device = device
+        self.device = None
         self.toast_overlay = toast_overlay
+        self.storage_writer = storage_writer
         self.clipboard = Gdk.Display.get_default().get_clipboard()
-        self._os_checked = False
-        self._services_checked = False
-        self.os_row.connect("map", self._on_os_row_map)
-        self.services_row.connect("map", self._on_services_row_map)
+        self._bindings = []
+        # Per expandable row: its expand button, cached subtitle label,
+        # whether ellipsization was checked, and any pending check.
+        self._expandable = {
+            self.os_row: {"button": self.os_expand_button, "label": None, "checked": False, "source": 0},
+            self.services_row: {"button": self.services_expand_button, "label": None, "checked": False,
+                                "source": 0},
+        }
+        for row in self._expandable:
+            row.connect("map", self._on_expandable_row_map)
+
+        focus_controller = Gtk.EventControllerFocus()
+        focus_controller.connect("enter", lambda c: self.name_apply_button.set_visible(True))
+        focus_controller.connect("leave", lambda c: self.name_apply_button.set_visible(False))
+        self.name_row.add_controller(focus_controller)
+
+    def bind(self, device):
+        """Show a device. Cards are recycled by the grid, so this can be
+        called many times, always after unbind()."""
+        self.device = device
 
         # Bidirectional binding keeps this card's name entry and the list
         # view's custom name column in sync live, without either widget
         # having to know about the other.
-        device.bind_property(
+        self._bindings.append(device.bind_property(
             "custom-name", self.name_row, "text",
-            GObject.BindingFlags.BIDIRECTIONAL | GObject.BindingFlags.SYNC_CREATE)
+            GObject.BindingFlags.BIDIRECTIONAL | GObject.BindingFlags.SYNC_CREATE))
 
-        focus_controller = Gtk.EventControllerFocus()
-        focus_controller.connect("enter", lambda c: self.name_apply_button.set_visible(True))
-        focus_controller.connect("leave", lambda c: self.name_apply_button.set_visible(False))
-        self.name_row.add_controller(focus_controller)
+        # Changes are filled in after the card is bound, once the scan has
+        # been compared with the previous one.
+        self._bindings.append(device.bind_property(
+            "change-display", self.changes_row, "subtitle", GObject.BindingFlags.SYNC_CREATE))
+        self._bindings.append(device.bind_property(
+            "change-display", self.changes_row, "visible", GObject.BindingFlags.SYNC_CREATE,
+            lambda _binding, text: bool(text)))
 
         self.refresh()
 
+    def unbind(self):
+        for binding in self._bindings:
+            binding.unbind()
+        self._bindings.clear()
+        self.device = None
+
     def refresh(self):
         """Populate the card from the bound Device model"""
         device = self.device
@@ -76,21 +102,22 @@ class DeviceCard(Adw.Bin):
         self.ports_row.set_subtitle(device.ports_display)
         self.services_row.set_subtitle(device.services_display)
         self.services_row.set_tooltip_text(device.services_display if device.services_display else None)
-        self.services_row.set_subtitle_lines(1)
-        self.services_expand_button.set_visible(False)
-        self.services_expand_button.set_active(False)
-        self._services_checked = False
 
         self.os_row.set_subtitle(device.os_display)
         self.os_row.set_tooltip_text(device.os_display if device.os_display else None)
         self.os_row.set_visible(device.deep_scanned)
-        # The expand button only makes sense when the info actually wraps to
+
+        # The expand buttons only make sense when the info actually wraps to
         # more than one line; ellipsization is checked once the row is laid
-        # out (see _on_os_row_map).
-        self.os_expand_button.set_visible(False)
-        self.os_expand_button.set_active(False)
-        self.os_row.set_subtitle_lines(1)
-        self._os_checked = False
+        # out (see _on_expandable_row_map).
+        for row, state in self._expandable.items():
+            row.set_subtitle_lines(1)
+            state["button"].set_visible(False)
+            state["button"].set_active(False)
+            state["checked"] = False
+            # A recycled card is already mapped, so no map signal will come.
+            if row.get_mapped():
+                self._schedule_check(row)
 
     def _find_subtitle_label(self, row):
         """Find the GtkLabel used for the row's subtitle"""
@@ -104,38 +131,32 @@ class DeviceCard(Adw.Bin):
             child = child.get_next_sibling()
         return None
 
-    def _on_os_row_map(self, row):
+    def _on_expandable_row_map(self, row):
         """Check ellipsization once the row is mapped and laid out"""
-        if not self._os_checked:
-            GLib.idle_add(self._check_os_ellipsized)
-
-    def _check_os_ellipsized(self):
-        """Show the expand button only when the subtitle is ellipsized"""
-        if not self.os_row.get_mapped():
-            return GLib.SOURCE_CONTINUE
-        label = self._find_subtitle_label(self.os_row)
-        layout = label.get_layout() if label else None
-        if layout is None or label.get_width() <= 1:
-            return GLib.SOURCE_CONTINUE
-        self._os_checked = True
-        self.os_expand_button.set_visible(layout.is_ellipsized())
-        return GLib.SOURCE_REMOVE
+        if not self._expandable[row]["checked"]:
+            self._schedule_check(row)
 
-    def _on_services_row_map(self, row):
-        """Check ellipsization once the row is mapped and laid out"""
-        if not self._services_checked:
-            GLib.idle_add(self._check_services_ellipsized)
+    def _schedule_check(self, row):
+        state = self._expandable[row]
+        if not state["source"]:
+            state["source"] = GLib.idle_add(self._check_ellipsized, row)
 
-    def _check_services_ellipsized(self):
+    def _check_ellipsized(self, row):
         """Show the expand button only when the subtitle is ellipsized"""
-        if not self.services_row.get_mapped():
-            return GLib.SOURCE_CONTINUE
-        label = self._find_subtitle_label(self.services_row)
+        state = self._expandable[row]
+        if not row.get_mapped() or self.device is None:
+            # Checked again from the map handler once it is shown.
+            state["source"] = 0
+            return GLib.SOURCE_REMOVE
+        if state["label"] is None:
+            state["label"] = self._find_subtitle_label(row)
+        label = state["label"]
         layout = label.get_layout() if label else None
         if layout is None or label.get_width() <= 1:
             return GLib.SOURCE_CONTINUE
-        self._services_checked = True
-        self.services_expand_button.set_visible(layout.is_ellipsized())
+        state["source"] = 0
+        state["checked"] = True
+        state["button"].set_visible(layout.is_ellipsized())
         return GLib.SOURCE_REMOVE
 
     def _set_expanded(self, row, button, expanded, full_tooltip):
@@ -166,8 +187,8 @@ class DeviceCard(Adw.Bin):
     def on_name_apply(self, _widget):
         """Persist a custom name when the apply button is clicked or Enter is pressed"""
         # The name entry's text is already synced onto self.device.custom_name
-        # via the bind_property() set up in __init__.
-        storage.set_custom_name(self.device.registry_key, self.device.custom_name)
+        # via the bind_property() set up in bind().
+        self.storage_writer.set_custom_name(self.device.registry_key, self.device.custom_name)
         root = self.get_root()
         if root:
             root.set_focus(None)
@@ -21,10 +21,11 @@ import gi
 
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, Gio
+from gi.repository import Gtk, Adw, Gio, GLib
 
 from .scanner import NetworkScanner
 from .pages import HomePage, ResultsPage, HistoryDialog
+from . import storage
 
 @Gtk.Template(resource_path='/io/github/zingytomato/netpeek/gtk/main_window.ui')
 class NetworkScannerWindow(Adw.ApplicationWindow):
@@ -34,11 +35,12 @@ class NetworkScannerWindow(Adw.ApplicationWindow):
     toast_overlay = Gtk.Template.Child()
     navigation_view = Gtk.Template.Child()
 
-    def __init__(self, settings, **kwargs):
+    def __init__(self, settings, storage_writer, **kwargs):
         super().__init__(**kwargs)
 
         self.settings = settings
-        self.scanner = NetworkScanner()
+        self.storage_writer = storage_writer
+        self.scanner = NetworkScanner(dispatch=GLib.idle_add)
         self._came_from_history = False
         self.setup_pages()
         self.create_actions()
@@ -89,11 +91,15 @@ class NetworkScannerWindow(Adw.ApplicationWindow):
         dialog = HistoryDialog(self.on_history_scan_selected)
         dialog.present(self)
 
-    def on_history_scan_selected(self, scan):
+    def on_history_scan_selected(self, scan_id):
         """Load a scan chosen from history into the results page"""
+        scan = storage.load_scan(scan_id)
+        if scan is None:
+            return
         if self.navigation_view.get_visible_page() != self.results_page:
             self.navigation_view.push(self.results_page)
-        self.results_page.load_from_history(scan.get('ip_range', ''), scan.get('devices', []), scan.get('deep_scan', False))
+        self.results_page.load_from_history(scan.get('ip_range', ''), scan.get('devices', []),
+                                            scan.get('deep_scan', False), scan_id=scan['id'])
         self._came_from_history = True
 
     def _on_page_popped(self, navigation_view, page):
@@ -116,6 +122,7 @@ class NetworkScannerWindow(Adw.ApplicationWindow):
             toast_overlay=self.toast_overlay,
             scanner=self.scanner,
             settings=self.settings,
+            storage_writer=self.storage_writer,
         )
 
         self.home_page.connect_results_page(self.results_page)